@@ -0,0 +1,434 @@
+"""Regression benchmarks for the analysis pipeline.
+
+Builds a synthetic repository of the requested shape, then times each stage
+and records its peak Python memory (``tracemalloc``; memory used by git
+subprocesses is not included). Run from the repository root:
+
+    python benchmarks/run.py --commits 5000 --branches 4 --authors 3
+    python benchmarks/run.py --only numstat walk --json results.json
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_repo import generate_repo
+
+SUITES = ('numstat', 'walk', 'clone', 'discovery', 'database')
+# Seconds the stub GitHub API takes per request, so concurrent fetching shows
+STUB_LATENCY = 0.02
+
+
+def measure(name: str, func: Callable[[], Optional[Dict]], repeat: int = 1) -> Dict:
+    """Run ``func`` ``repeat`` times; report the best wall time and the highest peak memory."""
+    best = None
+    peak = 0
+    extra = {}
+    for _ in range(repeat):
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            extra = func() or {}
+        finally:
+            elapsed = time.perf_counter() - started
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        best = elapsed if best is None else min(best, elapsed)
+    result = {'benchmark': name, 'seconds': round(best, 4), 'peak_mib': round(peak / 1024 ** 2, 2), **extra}
+    print(f"{name:<28} {result['seconds']:>9.3f}s {result['peak_mib']:>9.2f} MiB  {_format_extra(extra)}")
+    return result
+
+
+def _format_extra(extra: Dict) -> str:
+    return ' '.join(f"{key}={value}" for key, value in extra.items())
+
+
+def bench_numstat(repo_dir: str, repeat: int) -> List[Dict]:
+    """Parse and aggregate a captured ``git log --numstat`` of every author: totals, per-commit rows, file breakdowns."""
+    from numstat import LOG_FORMAT, FileStats, aggregate, commit_records, parse_log
+
+    log = subprocess.run(
+        ['git', 'log', '--all', f'--pretty=tformat:{LOG_FORMAT}', '--numstat'],
+        cwd=repo_dir, check=True, capture_output=True
+    ).stdout
+    log_mib = round(len(log) / 1024 ** 2, 2)
+
+    def totals():
+        aggregated = aggregate(parse_log(io.BytesIO(log)), include_months=True)
+        return {'log_mib': log_mib, 'lines': aggregated['total_lines']}
+
+    def commits():
+        return {'log_mib': log_mib, 'commits': len(commit_records(parse_log(io.BytesIO(log), details=True)))}
+
+    def files():
+        stats = FileStats()
+        aggregate(parse_log(io.BytesIO(log), files=stats), include_months=True)
+        return {'log_mib': log_mib, 'paths': len(stats.totals())}
+
+    return [
+        measure('numstat_parse', totals, repeat),
+        measure('numstat_commits', commits, repeat),
+        measure('numstat_files', files, repeat)
+    ]
+
+
+def bench_walk(repo_dir: str, identities: List, repeat: int) -> List[Dict]:
+    """``analyze_local_repo`` on the generated repository, for one author and for all."""
+    from github_client import analyze_local_repo
+
+    name, email = identities[0]
+    results = [measure('walk_one_author', lambda: _checked(analyze_local_repo(repo_dir, name, [email], include_months=True)), repeat)]
+    if len(identities) > 1:
+        # Every identity's name and email passed at once, as for a user with many addresses
+        names = [identity[0] for identity in identities]
+        emails = [identity[1] for identity in identities]
+        results.append(measure(
+            'walk_all_authors',
+            lambda: _checked(analyze_local_repo(repo_dir, names[0], names[1:] + emails, include_months=True)),
+            repeat
+        ))
+    return results
+
+
+def bench_clone(repo_dir: str, identities: List, repeat: int) -> List[Dict]:
+    """``GitHubClient.analyze_repo_contributions`` end to end, cloning over ``file://``."""
+    from github_client import GitHubClient
+    from http_cache import ResponseCache
+    from transport import ANONYMOUS
+
+    name, email = identities[0]
+    client = GitHubClient(ANONYMOUS, response_cache=ResponseCache(':memory:'))
+    url = f"file://{os.path.abspath(repo_dir)}"
+    return [measure(
+        'clone_and_walk',
+        lambda: _checked(client.analyze_repo_contributions(name, 'synthetic', url, [email], include_months=True)),
+        repeat
+    )]
+
+
+def _checked(contribution: Dict) -> Dict:
+    if 'error' in contribution:
+        raise RuntimeError(contribution['error'])
+    return {'lines': contribution['total_lines']}
+
+
+def bench_discovery(repo_count: int, repeat: int) -> List[Dict]:
+    """``get_user_repos`` against a local stub of the GitHub API, cold and revalidated via ETag.
+
+    The async client is checked as it is measured: every page must arrive,
+    pages must be fetched concurrently and a warm cache must only see 304s.
+    """
+    import requests
+    from async_github_client import AsyncGitHubClient
+    from github_client import GitHubClient
+    from http_cache import ResponseCache
+    from rate_limit import RateLimiter
+    from transport import ANONYMOUS
+
+    server = _stub_api(repo_count)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        def listing(cache: ResponseCache) -> Dict:
+            # Anonymous, so neither GITHUB_TOKEN nor a /user lookup reaches the stub
+            client = GitHubClient(
+                ANONYMOUS,
+                base_url=base_url,
+                session=requests.Session(),
+                response_cache=cache,
+                rate_limiter=RateLimiter()
+            )
+            repos = client.get_user_repos('bench-user')
+            return {'repos': len(repos), 'requests': server.requests, **cache.stats()}
+
+        def cold():
+            server.requests = 0
+            return listing(ResponseCache(':memory:'))
+
+        warm_cache = ResponseCache(':memory:')
+        listing(warm_cache)
+
+        def warm():
+            server.requests = 0
+            warm_cache.hits = warm_cache.misses = 0
+            return listing(warm_cache)
+
+        async def async_listing(cache: ResponseCache) -> List[Dict]:
+            async with AsyncGitHubClient(ANONYMOUS, base_url=base_url, response_cache=cache, rate_limiter=RateLimiter()) as client:
+                return await client.get_user_repos('bench-user')
+
+        def async_run(cache: ResponseCache) -> Dict:
+            server.requests = server.not_modified = server.max_in_flight = 0
+            repos = asyncio.run(async_listing(cache))
+            if len(repos) != repo_count:
+                raise RuntimeError(f"async listing returned {len(repos)} of {repo_count} repositories")
+            pages = -(-repo_count // 100)
+            if pages > 1 and server.max_in_flight < 2:
+                raise RuntimeError("async listing fetched its pages one at a time")
+            return {'repos': len(repos), 'requests': server.requests, 'in_flight': server.max_in_flight, **cache.stats()}
+
+        def async_cold():
+            return async_run(ResponseCache(':memory:'))
+
+        async_cache = ResponseCache(':memory:')
+        async_run(async_cache)
+
+        def async_warm():
+            async_cache.hits = async_cache.misses = 0
+            result = async_run(async_cache)
+            if server.not_modified != server.requests:
+                raise RuntimeError(f"only {server.not_modified} of {server.requests} revalidations were 304s")
+            return result
+
+        def async_lookups():
+            names = [f'bench-user/repo-{i}' for i in range(min(repo_count, 200))]
+
+            async def lookup():
+                async with AsyncGitHubClient(ANONYMOUS, base_url=base_url, rate_limiter=RateLimiter()) as client:
+                    return await client.get_repos(names)
+
+            server.requests = server.not_modified = server.max_in_flight = 0
+            repos = asyncio.run(lookup())
+            if [repo['full_name'] for repo in repos] != names:
+                raise RuntimeError("get_repos returned repositories out of order")
+            return {'repos': len(repos), 'in_flight': server.max_in_flight}
+
+        return [
+            measure('discovery_cold', cold, repeat),
+            measure('discovery_revalidated', warm, repeat),
+            measure('discovery_async_cold', async_cold, repeat),
+            measure('discovery_async_revalidated', async_warm, repeat),
+            measure('discovery_async_lookups', async_lookups, repeat)
+        ]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _stub_api(repo_count: int, latency: float = STUB_LATENCY) -> ThreadingHTTPServer:
+    """Serve ``/users/<name>/repos`` pages of ``repo_count`` fake repositories and ``/repos/<owner>/<name>``.
+
+    Responses carry ETags and listings a GitHub-style ``Link`` header. Each
+    request takes ``latency`` seconds; ``max_in_flight`` records how many
+    were being served at once.
+    """
+    lock = threading.Lock()
+
+    def repo(i: int) -> Dict:
+        return {
+            'name': f'repo-{i}',
+            'full_name': f'bench-user/repo-{i}',
+            'clone_url': f'https://example.invalid/bench-user/repo-{i}.git',
+            'fork': i % 10 == 0
+        }
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                server.requests += 1
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            try:
+                time.sleep(latency)
+                self._respond()
+            finally:
+                with lock:
+                    server.in_flight -= 1
+
+        def _respond(self):
+            parsed = urlparse(self.path)
+            query = parse_qs(parsed.query)
+            link = None
+            if parsed.path.startswith('/repos/'):
+                body = json.dumps(repo(int(parsed.path.rsplit('-', 1)[-1]))).encode()
+            else:
+                page = int(query.get('page', ['1'])[0])
+                per_page = int(query.get('per_page', ['30'])[0])
+                first = (page - 1) * per_page
+                body = json.dumps([repo(i) for i in range(first, min(first + per_page, repo_count))]).encode()
+                last = max(-(-repo_count // per_page), 1)
+                if last > 1:
+                    base = f"http://{self.headers['Host']}{parsed.path}"
+                    link = f'<{base}?per_page={per_page}&page={min(page + 1, last)}>; rel="next", <{base}?per_page={per_page}&page={last}>; rel="last"'
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == etag:
+                with lock:
+                    server.not_modified += 1
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            if link:
+                self.send_header('Link', link)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.requests = server.not_modified = server.in_flight = server.max_in_flight = 0
+    return server
+
+
+def bench_database(users: int, mongodb_uri: Optional[str], repeat: int) -> List[Dict]:
+    """``Database`` writes and leaderboard reads, on ``mongodb_uri`` or else mongomock."""
+    import database
+
+    if not mongodb_uri:
+        try:
+            import mongomock
+        except ImportError:
+            print("database: skipped (pass --mongodb-uri or install mongomock)")
+            return []
+        database.MongoClient = mongomock.MongoClient
+        mongodb_uri = 'mongodb://localhost'
+
+    db = database.Database(mongodb_uri)
+    records = [
+        {
+            'username': f'bench-user{i:06d}',
+            'all_time': {'total_added': i * 7, 'total_deleted': i * 3, 'total_net': i * 4},
+            'year_2024': {'total_added': i, 'total_deleted': i // 2, 'total_net': i - i // 2},
+            'series': {'start_week': 2800 + i % 52, 'added': [i % 11] * 104, 'deleted': [i % 5] * 104}
+        }
+        for i in range(users)
+    ]
+
+    def bulk():
+        reports = db.bulk_store_user_stats(records)
+        failed = [report for report in reports if not report['ok']]
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {users} bulk upserts failed, first error: {failed[0]['error']}")
+        return {'users': users}
+
+    single_users = min(users, 500)
+
+    def single():
+        for record in records[:single_users]:
+            stored = db.store_user_stats(
+                record['username'],
+                record['all_time'],
+                periods={'year_2024': record['year_2024']},
+                series=record['series']
+            )
+            if not stored:
+                raise RuntimeError(f"Storing {record['username']} failed")
+        return {'users': single_users}
+
+    def leaderboard():
+        db.leaderboard = database.Leaderboard(db.users)
+        top = db.get_leaderboard('all_time', limit=100)
+        rank = db.get_user_rank(records[single_users // 2]['username'])
+        return {'top': len(top), 'rank': rank['rank'] if rank else None}
+
+    def rolling():
+        db.series_index = database.SeriesIndex(db.users)
+        top = db.get_leaderboard('last_90_days', limit=100)
+        return {'top': len(top)}
+
+    def rolling_reads():
+        # Served from the loaded series; nothing is re-read from Mongo
+        for period in ['last_90_days', 'rolling_12_months'] * 10:
+            db.get_leaderboard(period, limit=100)
+            db.get_user_rank(records[single_users // 2]['username'], period=period)
+        return {'reads': 40}
+
+    def search():
+        found = db.search_users('bench-user000', limit=10, prefix=True)
+        return {'found': len(found)}
+
+    try:
+        results = []
+        # Only time bulk writes the backend actually performs
+        probe = db.bulk_store_user_stats(records[:1])[0]
+        if probe['ok']:
+            results.append(measure('db_bulk_upsert', bulk, repeat))
+        else:
+            # e.g. mongomock lagging behind the installed pymongo's bulk_write
+            print(f"db_bulk_upsert: skipped, the backend rejected bulk writes ({probe['error']})")
+        return results + [
+            measure('db_single_upserts', single, repeat),
+            measure('db_leaderboard_load', leaderboard, repeat),
+            measure('db_rolling_leaderboard', rolling, repeat),
+            measure('db_rolling_reads', rolling_reads, repeat),
+            measure('db_prefix_search', search, repeat)
+        ]
+    finally:
+        db.users.delete_many({'username': {'$regex': '^bench-user'}})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline on a synthetic repository")
+    parser.add_argument('--commits', type=int, default=2000)
+    parser.add_argument('--branches', type=int, default=1)
+    parser.add_argument('--files', type=int, default=50)
+    parser.add_argument('--lines-per-commit', type=int, default=20)
+    parser.add_argument('--binary-every', type=int, default=0, help="add a binary file every n commits")
+    parser.add_argument('--authors', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repos', type=int, default=1000, help="repositories served by the stub API")
+    parser.add_argument('--users', type=int, default=5000, help="users written by the database benchmark")
+    parser.add_argument('--mongodb-uri', default=None, help="benchmark a scratch MongoDB instead of mongomock; bench-user* documents are removed afterwards")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per benchmark; the best time is kept")
+    parser.add_argument('--only', nargs='+', choices=SUITES, default=list(SUITES))
+    parser.add_argument('--json', default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='git-contributions-bench-')
+    results = []
+    try:
+        if {'numstat', 'walk', 'clone'} & set(args.only):
+            repo_dir = os.path.join(workdir, 'synthetic.git')
+            started = time.perf_counter()
+            identities = generate_repo(
+                repo_dir,
+                commits=args.commits,
+                branches=args.branches,
+                files=args.files,
+                lines_per_commit=args.lines_per_commit,
+                binary_every=args.binary_every,
+                authors=args.authors,
+                seed=args.seed
+            )
+            print(f"Generated {args.commits} commits in {time.perf_counter() - started:.1f}s at {repo_dir}")
+            if 'numstat' in args.only:
+                results += bench_numstat(repo_dir, args.repeat)
+            if 'walk' in args.only:
+                results += bench_walk(repo_dir, identities, args.repeat)
+            if 'clone' in args.only:
+                results += bench_clone(repo_dir, identities, args.repeat)
+        if 'discovery' in args.only:
+            results += bench_discovery(args.repos, args.repeat)
+        if 'database' in args.only:
+            results += bench_database(args.users, args.mongodb_uri, args.repeat)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'shape': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import os
+import random
+import subprocess
+import time
+from typing import Dict, IO, List, Tuple
+
+# Spread of commit timestamps, ending now
+DEFAULT_YEARS = 3
+
+
+def generate_repo(path: str,
+                  commits: int = 1000,
+                  branches: int = 1,
+                  files: int = 50,
+                  lines_per_commit: int = 20,
+                  binary_every: int = 0,
+                  authors: int = 1,
+                  years: int = DEFAULT_YEARS,
+                  seed: int = 0) -> List[Tuple[str, str]]:
+    """Create a bare repository at ``path`` with a synthetic history.
+
+    ``commits`` are spread round-robin over ``branches`` (each branch forks
+    from ``main``) and over ``authors`` identities, with timestamps evenly
+    spaced across the last ``years`` years. Every commit rewrites or appends
+    ``lines_per_commit`` lines in one of ``files`` text files; with
+    ``binary_every`` set, every n-th commit also adds a binary file.
+    The whole history goes through a single ``git fast-import``, so large
+    repositories build in seconds.
+
+    Returns the ``(name, email)`` of each author, in the order used.
+    """
+    identities = [(f"Author {i}", f"author{i}@example.com") for i in range(authors)]
+    subprocess.run(['git', 'init', '--bare', '--quiet', '--initial-branch=main', path], check=True)
+    importer = subprocess.Popen(
+        ['git', 'fast-import', '--quiet', '--done'],
+        cwd=path,
+        stdin=subprocess.PIPE
+    )
+    try:
+        _write_history(importer.stdin, commits, branches, files, lines_per_commit, binary_every, identities, years, seed)
+        importer.stdin.write(b'done\n')
+    finally:
+        importer.stdin.close()
+        if importer.wait() != 0:
+            raise subprocess.CalledProcessError(importer.returncode, 'git fast-import')
+    return identities
+
+
+def _write_history(out: IO[bytes],
+                   commits: int,
+                   branches: int,
+                   files: int,
+                   lines_per_commit: int,
+                   binary_every: int,
+                   identities: List[Tuple[str, str]],
+                   years: int,
+                   seed: int):
+    rng = random.Random(seed)
+    end = int(time.time())
+    start = end - years * 365 * 24 * 3600
+    step = (end - start) // max(commits, 1)
+
+    # Per-branch file contents (copied on fork) and the mark of the branch tip
+    contents: Dict[str, Dict[str, List[bytes]]] = {'main': {}}
+    tips: Dict[str, int] = {}
+
+    for index in range(commits):
+        branch = 'main' if index % branches == 0 else f'branch-{index % branches}'
+        mark = index + 1
+        parent = tips.get(branch)
+        if branch not in contents:
+            # Fork from wherever main is now
+            contents[branch] = dict(contents['main'])
+            parent = tips.get('main')
+        state = contents[branch]
+
+        name, email = identities[index % len(identities)]
+        timestamp = start + index * step
+        path = f"src/module_{rng.randrange(files)}.txt"
+        lines = list(state.get(path, []))
+        for _ in range(lines_per_commit):
+            line = f"{rng.getrandbits(64):016x}\n".encode()
+            if lines and rng.random() < 0.5:
+                lines[rng.randrange(len(lines))] = line
+            else:
+                lines.append(line)
+        state[path] = lines
+
+        out.write(f"commit refs/heads/{branch}\nmark :{mark}\n".encode())
+        out.write(f"author {name} <{email}> {timestamp} +0000\n".encode())
+        out.write(f"committer {name} <{email}> {timestamp} +0000\n".encode())
+        _data(out, f"Commit {index}\n".encode())
+        if parent is not None:
+            out.write(f"from :{parent}\n".encode())
+        out.write(f"M 100644 inline {path}\n".encode())
+        _data(out, b''.join(lines))
+        if binary_every and index % binary_every == 0:
+            out.write(f"M 100644 inline assets/blob_{index}.bin\n".encode())
+            _data(out, b'\x00' + os.urandom(rng.randrange(256, 4096)))
+        out.write(b'\n')
+        tips[branch] = mark
+
+
+def _data(out: IO[bytes], payload: bytes):
+    out.write(f"data {len(payload)}\n".encode())
+    out.write(payload)
+    out.write(b'\n')
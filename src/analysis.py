@@ -0,0 +1,135 @@
+from typing import Callable, Dict, List, Optional
+
+import telemetry
+from contribution_index import ContributionIndex
+from database import Database, get_database
+from github_client import GitHubClient, period_contribution
+from repo_cache import RepoCache
+from timeseries import sum_series
+
+
+def run_user_analysis(token: str,
+                      username: str,
+                      author_emails: List[str],
+                      avatar_url: Optional[str] = None,
+                      repo_cache: Optional[RepoCache] = None,
+                      max_workers: Optional[int] = None,
+                      timeout: Optional[float] = None,
+                      progress_callback: Optional[Callable[[int, int, Dict, float], None]] = None,
+                      db: Optional[Database] = None,
+                      store: bool = True,
+                      max_size_kb: Optional[int] = None,
+                      degraded_size_kb: Optional[int] = None) -> Dict:
+    """Analyze every non-fork repository of ``username`` and store the totals.
+
+    Returns the per-repository rows for all time (``all_time``) and for each
+    calendar year with activity (``years``, keyed by year), skipping
+    repositories without contributions in that period, plus the
+    number of repositories analyzed, any per-repository ``errors`` and the
+    repositories only analyzed on their default branch (``degraded``) because
+    they are over ``degraded_size_kb``; those over ``max_size_kb`` are skipped.
+    ``progress_callback`` is called as ``(completed, total, contribution, eta_seconds)``.
+    The user's weekly series (``series``, see ``timeseries``) is stored too,
+    so leaderboards over any date range can be computed later. Pass
+    ``store=False`` to leave writing the totals to the caller, e.g. to batch
+    them with ``Database.bulk_store_user_stats``.
+
+    The result's ``telemetry`` holds the per-stage timings and counters of
+    the run (see ``telemetry.Trace``).
+    """
+    with telemetry.start_trace('analyze_user', username=username) as trace:
+        result = _run_user_analysis(token, username, author_emails, avatar_url, repo_cache, max_workers,
+                                    timeout, progress_callback, db, store, max_size_kb, degraded_size_kb)
+    result['telemetry'] = trace.to_dict()
+    return result
+
+
+def _run_user_analysis(token: str,
+                       username: str,
+                       author_emails: List[str],
+                       avatar_url: Optional[str],
+                       repo_cache: Optional[RepoCache],
+                       max_workers: Optional[int],
+                       timeout: Optional[float],
+                       progress_callback: Optional[Callable[[int, int, Dict, float], None]],
+                       db: Optional[Database],
+                       store: bool,
+                       max_size_kb: Optional[int],
+                       degraded_size_kb: Optional[int]) -> Dict:
+    db = db or get_database()
+    client = GitHubClient(token, repo_cache=repo_cache)
+
+    with telemetry.span('list_repos'):
+        repos = client.get_user_repos(username)
+    source_repos = [repo for repo in repos if not repo['fork']]
+
+    contributions_all_time = []
+    contributions_by_year = {}
+    weekly_series = []
+    errors = []
+    degraded = []
+
+    # Only history newer than the last analysis is walked; totals
+    # are rebuilt from the per-commit index
+    results = ContributionIndex(db).analyze_repos(
+        client,
+        username,
+        source_repos,
+        author_emails,
+        max_workers=max_workers,
+        timeout=timeout,
+        progress_callback=progress_callback,
+        max_size_kb=max_size_kb,
+        degraded_size_kb=degraded_size_kb
+    )
+    for contribution in results:
+        if 'error' in contribution:
+            errors.append({'repository': contribution['repository'], 'error': contribution['error']})
+        if contribution.get('degraded'):
+            degraded.append(contribution['repository'])
+
+        contribution_all = period_contribution(contribution)
+        if contribution_all['added_lines'] > 0 or contribution_all['deleted_lines'] > 0:
+            contributions_all_time.append(contribution_all)
+
+        for year in contribution.get('years', {}):
+            contribution_year = period_contribution(contribution, year=year)
+            if contribution_year['added_lines'] > 0 or contribution_year['deleted_lines'] > 0:
+                contributions_by_year.setdefault(year, []).append(contribution_year)
+
+        if contribution.get('weekly', {}).get('added'):
+            weekly_series.append(contribution['weekly'])
+
+    series = sum_series(weekly_series)
+    if store and contributions_all_time:
+        with telemetry.span('store_stats'):
+            db.store_user_stats(
+                username,
+                summarize(contributions_all_time),
+                periods=year_periods(contributions_by_year),
+                avatar_url=avatar_url,
+                series=series
+            )
+
+    return {
+        'repo_count': len(source_repos),
+        'all_time': contributions_all_time,
+        'years': dict(sorted(contributions_by_year.items())),
+        'series': series,
+        'errors': errors,
+        'degraded': degraded
+    }
+
+
+def year_periods(contributions_by_year: Dict[int, List[Dict]]) -> Dict[str, Dict]:
+    """``year_YYYY`` totals for ``Database.store_user_stats`` from per-year repository rows."""
+    return {f"year_{year}": summarize(rows) for year, rows in contributions_by_year.items()}
+
+
+def summarize(rows: List[Dict]) -> Dict:
+    """Collapse per-repository rows into the totals stored by ``Database.store_user_stats``."""
+    return {
+        "total_added": sum(row['added_lines'] for row in rows),
+        "total_deleted": sum(row['deleted_lines'] for row in rows),
+        "total_net": sum(row['total_lines'] for row in rows)
+    }
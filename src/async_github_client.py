@@ -0,0 +1,122 @@
+import asyncio
+from typing import Dict, List, Optional
+
+import httpx
+
+import telemetry
+from http_cache import ResponseCache
+from rate_limit import RateLimiter
+from transport import GITHUB_API_URL, POOL_MAXSIZE, get_rate_limiter, http2_available, last_page_number, revalidate
+
+
+class AsyncGitHubClient:
+    """asyncio variant of the GitHub API calls in ``GitHubClient``.
+
+    Pages of a listing and per-repository lookups are fetched concurrently
+    over one pooled ``httpx.AsyncClient`` (HTTP/2 when ``h2`` is installed),
+    with at most ``max_concurrency`` requests in flight. Requests are
+    scheduled by the same ``RateLimiter`` as ``GitHubClient``'s, and with a
+    ``response_cache`` they are conditional, as in ``transport.cached_get``.
+    Point ``base_url`` at a local stub server to exercise it without touching
+    GitHub (see ``benchmarks/run.py``).
+    """
+
+    def __init__(self,
+                 token: Optional[str] = None,
+                 base_url: str = GITHUB_API_URL,
+                 max_concurrency: int = POOL_MAXSIZE,
+                 client: Optional[httpx.AsyncClient] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        self.token = token
+        self.headers = {
+            'Authorization': f'token {self.token}' if self.token else '',
+            'Accept': 'application/vnd.github.v3+json'
+        }
+        self.base_url = base_url
+        self._client = client or httpx.AsyncClient(
+            http2=http2_available(),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=30.0
+        )
+        self.response_cache = response_cache
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._authenticated_user: Optional[str] = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def get_user_repos(self, username: str) -> List[Dict]:
+        """List the repositories ``username`` owns or is affiliated with.
+
+        Mirrors ``GitHubClient.get_user_repos``: the affiliation filter of the
+        authenticated endpoint replaces per-repository collaborator lookups.
+        """
+        if self.token and username.lower() == (await self.get_authenticated_user()).lower():
+            url = f"{self.base_url}/user/repos"
+            params = {'affiliation': 'owner,collaborator,organization_member'}
+        else:
+            url = f"{self.base_url}/users/{username}/repos"
+            params = {'type': 'all'}
+
+        return await self._get_all_pages(url, params)
+
+    async def get_repos(self, repo_full_names: List[str]) -> List[Dict]:
+        """Fetch metadata for several repositories concurrently, in input order."""
+        responses = await asyncio.gather(*(self._get(f"{self.base_url}/repos/{name}") for name in repo_full_names))
+        return [response.json() for response in responses]
+
+    async def get_authenticated_user(self) -> str:
+        """Get the username of the authenticated user"""
+        if not self.token:
+            raise ValueError("GitHub token is required")
+
+        if self._authenticated_user is None:
+            response = await self._get(f"{self.base_url}/user")
+            self._authenticated_user = response.json()['login']
+        return self._authenticated_user
+
+    async def _get_all_pages(self, url: str, params: Dict) -> List[Dict]:
+        """Fetch the first page, then every remaining page at once using the ``Link`` header."""
+        params = {**params, 'per_page': 100}
+        first = await self._get(url, params={**params, 'page': 1})
+        items = list(first.json())
+
+        pages = range(2, last_page_number(first) + 1)
+        responses = await asyncio.gather(*(self._get(url, params={**params, 'page': page}) for page in pages))
+        for response in responses:
+            items.extend(response.json())
+        return items
+
+    async def _get(self, url: str, params: Optional[Dict] = None) -> httpx.Response:
+        cache = self.response_cache
+        if cache is None:
+            response = await self._send(url, params, {})
+        else:
+            exchange = revalidate(cache, cache.key_for(url, params, self.headers['Authorization']))
+            extra_headers = next(exchange)
+            try:
+                while True:
+                    extra_headers = exchange.send(await self._send(url, params, extra_headers))
+            except StopIteration as done:
+                response, entry = done.value
+            if entry is not None:
+                return httpx.Response(200, headers=entry['headers'], content=entry['body'], request=response.request)
+        response.raise_for_status()
+        return response
+
+    async def _send(self, url: str, params: Optional[Dict], extra_headers: Dict) -> httpx.Response:
+        async def attempt(pooled_token: Optional[str]) -> httpx.Response:
+            override = {'Authorization': f'token {pooled_token}'} if pooled_token else {}
+            async with self._semaphore:
+                telemetry.count('api_calls')
+                return await self._client.get(url, params=params, headers={**self.headers, **extra_headers, **override})
+
+        return await self.rate_limiter.arequest(attempt, token=self.token)
@@ -4,7 +4,7 @@ load_dotenv()
 import streamlit as st
 from requests_oauthlib import OAuth2Session
 import os
-import requests
+from transport import GITHUB_API_URL, cached_get, get_rate_limiter, get_response_cache
 
 # Use Streamlit secrets instead of environment variables
 IS_PROD = st.secrets.get('IS_PROD', False)
@@ -84,12 +84,14 @@ def get_user_info(token):
         }
         
         # Get user profile
-        response = requests.get('https://api.github.com/user', headers=headers)
+        cache = get_response_cache()
+        limiter = get_rate_limiter()
+        response = cached_get(f'{GITHUB_API_URL}/user', headers=headers, cache=cache, limiter=limiter)
         response.raise_for_status()
         user_data = response.json()
         
         # Get user emails
-        emails_response = requests.get('https://api.github.com/user/emails', headers=headers)
+        emails_response = cached_get(f'{GITHUB_API_URL}/user/emails', headers=headers, cache=cache, limiter=limiter)
         emails_response.raise_for_status()
         emails = [email['email'] for email in emails_response.json() if email['verified']]
         
@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import sys
+from typing import Dict, Iterator, List, Optional
+
+from batch import read_usernames
+from database import DEFAULT_BULK_BATCH_SIZE, Database
+
+
+def read_stats(path: str) -> Iterator[Dict]:
+    """Read precomputed stats records, one JSON object per line."""
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                # Still report the line so the caller sees it failed
+                yield {"username": f"<line {line_number}>", "error": str(e)}
+                continue
+            if not isinstance(record, dict):
+                yield {"username": f"<line {line_number}>", "error": f"Expected a JSON object, got {type(record).__name__}"}
+                continue
+            yield record
+
+
+def analyze_usernames(usernames: List[str],
+                      token: str,
+                      db: Database,
+                      max_workers: Optional[int] = None,
+                      timeout: Optional[float] = None) -> Iterator[Dict]:
+    """Analyze each user's repositories and yield records ready for bulk storage."""
+    from analysis import run_user_analysis, summarize, year_periods
+    from repo_cache import RepoCache
+
+    repo_cache = RepoCache()
+    for username in usernames:
+        try:
+            # Without a list of the user's emails, commits are matched on the login alone
+            result = run_user_analysis(
+                token,
+                username,
+                [],
+                repo_cache=repo_cache,
+                max_workers=max_workers,
+                timeout=timeout,
+                db=db,
+                store=False
+            )
+        except Exception as e:
+            yield {"username": username, "error": str(e)}
+            continue
+        print(f"Analyzed {username}: {result['repo_count']} repositories", file=sys.stderr)
+        yield {
+            "username": username,
+            "all_time": summarize(result['all_time']),
+            **year_periods(result['years']),
+            "series": result['series']
+        }
+
+
+def _store(db: Database, records: Iterator[Dict], batch_size: int) -> Iterator[Dict]:
+    """Bulk-store records batch by batch, passing through records that already failed."""
+    batch = []
+    for record in records:
+        if 'error' in record:
+            yield {"username": record['username'], "ok": False, "error": record['error']}
+            continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield from db.bulk_store_user_stats(batch, batch_size=batch_size)
+            batch = []
+    if batch:
+        yield from db.bulk_store_user_stats(batch, batch_size=batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load contributor stats into the database")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--stats', help="JSON Lines file of precomputed stats records")
+    source.add_argument('--usernames', help="file with one GitHub username per line to analyze")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BULK_BATCH_SIZE, help="upserts per bulk write")
+    parser.add_argument('--mongodb-uri', default=None, help="defaults to the MONGODB_URI environment variable")
+    parser.add_argument('--max-workers', type=int, default=None, help="repositories analyzed in parallel per user")
+    parser.add_argument('--timeout', type=float, default=None, help="seconds allowed per repository")
+    args = parser.parse_args()
+
+    db = Database(args.mongodb_uri)
+    if args.stats:
+        records = read_stats(args.stats)
+    else:
+        token = os.environ.get('GITHUB_TOKEN')
+        if not token:
+            parser.error("--usernames needs a GITHUB_TOKEN environment variable")
+        records = analyze_usernames(read_usernames(args.usernames), token, db, args.max_workers, args.timeout)
+
+    failures = 0
+    stored = 0
+    for report in _store(db, records, args.batch_size):
+        if report['ok']:
+            stored += 1
+        else:
+            failures += 1
+            print(f"FAILED {report['username']}: {report['error']}", file=sys.stderr)
+
+    print(f"Stored {stored} users, {failures} failed", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
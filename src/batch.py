@@ -0,0 +1,273 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import telemetry
+from github_client import GitHubClient, analyze_local_repo, pushed_since
+from path_rules import PathRules, load_rules
+from repo_cache import RepoCache
+from scheduler import format_eta
+
+FORMATS = ('jsonl', 'parquet')
+
+
+def read_usernames(path: str) -> List[str]:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def read_identities(path: str) -> Dict[str, List[str]]:
+    """Read ``{"name": ["email", ...]}``, the author identities to match commits on."""
+    with open(path) as f:
+        identities = json.load(f)
+    if not isinstance(identities, dict):
+        raise ValueError(f"{path} must hold a JSON object mapping names to lists of emails")
+    return {name: list(emails or []) for name, emails in identities.items()}
+
+
+def find_local_repos(root: str) -> List[str]:
+    """Git repositories (bare or with a working tree) directly under ``root``."""
+    repos = []
+    for entry in sorted(os.listdir(root)):
+        path = os.path.join(root, entry)
+        if not os.path.isdir(path):
+            continue
+        is_worktree = os.path.exists(os.path.join(path, '.git'))
+        is_bare = os.path.isfile(os.path.join(path, 'HEAD')) and os.path.isdir(os.path.join(path, 'objects'))
+        if is_worktree or is_bare:
+            repos.append(path)
+    return repos
+
+
+def analyze_users(usernames: List[str],
+                  emails: Dict[str, List[str]],
+                  token: Optional[str] = None,
+                  repo_cache: Optional[RepoCache] = None,
+                  max_workers: Optional[int] = None,
+                  timeout: Optional[float] = None,
+                  include_months: bool = False,
+                  since: Optional[datetime] = None,
+                  until: Optional[datetime] = None,
+                  include_files: bool = False,
+                  path_rules: Optional[PathRules] = None,
+                  max_size_kb: Optional[int] = None,
+                  degraded_size_kb: Optional[int] = None) -> Iterator[Dict]:
+    """Analyze every non-fork repository of each user, yielding one row per (user, repository).
+
+    Repositories of all users share one schedule (see
+    ``GitHubClient.analyze_users_repos``), largest first, so a user with a
+    single huge repository doesn't hold up the rest of the batch. Size
+    limits are as for ``GitHubClient.analyze_repos``. With ``since``,
+    repositories not pushed to since then are left out.
+    """
+    client = GitHubClient(token, repo_cache=repo_cache, path_rules=path_rules)
+    user_repos = {}
+    for username in usernames:
+        try:
+            with telemetry.span('list_repos', username=username):
+                repos = [
+                    repo for repo in client.get_user_repos(username)
+                    if not repo['fork'] and pushed_since(repo, since)
+                ]
+        except Exception as e:
+            yield {'username': username, 'repository': None, 'error': f"Listing repositories failed: {e}"}
+            continue
+        print(f"Found {len(repos)} repositories for {username}", file=sys.stderr)
+        user_repos[username] = repos
+
+    def on_progress(completed: int, total: int, contribution: Dict, eta: float):
+        remaining = f", {format_eta(eta)} left" if completed < total else ""
+        print(f"Completed {contribution['repository']} ({completed}/{total}{remaining})", file=sys.stderr)
+
+    results = client.analyze_users_repos(
+        user_repos,
+        emails,
+        include_months=include_months,
+        max_workers=max_workers,
+        timeout=timeout,
+        progress_callback=on_progress,
+        max_size_kb=max_size_kb,
+        degraded_size_kb=degraded_size_kb,
+        since=since,
+        until=until,
+        include_files=include_files
+    )
+    for username, contribution in results:
+        yield _row(username, contribution)
+
+
+def analyze_local_repos(repo_dirs: List[str],
+                        identities: Dict[str, List[str]],
+                        max_workers: Optional[int] = None,
+                        timeout: Optional[float] = None,
+                        include_months: bool = False,
+                        since: Optional[datetime] = None,
+                        until: Optional[datetime] = None,
+                        include_files: bool = False,
+                        path_rules: Optional[PathRules] = None) -> Iterator[Dict]:
+    """Analyze each already-cloned repository for each identity, yielding one row per pair."""
+    tasks: List[Tuple[str, str]] = [(name, repo_dir) for name in identities for repo_dir in repo_dirs]
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 4) as executor:
+        futures = {
+            executor.submit(
+                telemetry.propagate(analyze_local_repo),
+                repo_dir,
+                name,
+                identities[name],
+                include_months=include_months,
+                timeout=timeout,
+                since=since,
+                until=until,
+                include_files=include_files,
+                path_rules=path_rules
+            ): name
+            for name, repo_dir in tasks
+        }
+        for future in as_completed(futures):
+            yield _row(futures[future], future.result())
+
+
+def _row(username: str, contribution: Dict) -> Dict:
+    return {'username': username, **contribution}
+
+
+def parse_date(value: str) -> datetime:
+    """``YYYY-MM-DD`` (or any ISO 8601 timestamp) as a UTC datetime."""
+    moment = datetime.fromisoformat(value)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def write_jsonl(rows: Iterator[Dict], path: str) -> int:
+    """Write rows as they arrive, so a crash late in the batch keeps earlier results."""
+    count = 0
+    out = sys.stdout if path == '-' else open(path, 'w')
+    try:
+        for row in rows:
+            out.write(json.dumps(row) + '\n')
+            out.flush()
+            count += 1
+            _report(row)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return count
+
+
+def write_parquet(rows: Iterator[Dict], path: str) -> int:
+    """Write all rows to one Parquet file; needs pandas with pyarrow (or fastparquet)."""
+    import pandas as pd
+
+    records = []
+    for row in rows:
+        _report(row)
+        record = dict(row)
+        # Nested period buckets don't map onto flat columns; keep them as JSON strings
+        for column in ('years', 'months', 'weekly', 'files'):
+            if column in record:
+                record[column] = json.dumps(record[column])
+        records.append(record)
+    try:
+        pd.DataFrame.from_records(records).to_parquet(path, index=False)
+    except ImportError as e:
+        raise SystemExit(f"Writing Parquet needs pyarrow or fastparquet installed ({e})")
+    return len(records)
+
+
+def _report(row: Dict):
+    if row.get('skipped'):
+        print(f"SKIPPED {row['username']}/{row.get('repository')}: {row['error']}", file=sys.stderr)
+    elif row.get('error'):
+        print(f"FAILED {row['username']}/{row.get('repository')}: {row['error']}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze contributions in batch, without the web UI")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--usernames', help="file with one GitHub username per line to analyze")
+    source.add_argument('--repos-dir', help="directory of already-cloned repositories to analyze")
+    parser.add_argument('--emails', help="JSON file mapping usernames to their commit emails (with --usernames)")
+    parser.add_argument('--identities', help="JSON file mapping author names to their emails (with --repos-dir)")
+    parser.add_argument('--output', '-o', default='-', help="output file, '-' for stdout (JSON Lines only)")
+    parser.add_argument('--format', choices=FORMATS, default=None, help="defaults to the output file extension, else jsonl")
+    parser.add_argument('--months', action='store_true', help="include per-month buckets")
+    parser.add_argument('--files', action='store_true', help="include the top extensions, directories and files by lines changed")
+    parser.add_argument('--year', type=int, default=None, help="only count commits made in this year")
+    parser.add_argument('--since', type=parse_date, default=None, help="only count commits from this date (YYYY-MM-DD)")
+    parser.add_argument('--until', type=parse_date, default=None, help="only count commits before this date (YYYY-MM-DD)")
+    parser.add_argument('--path-rules', default=None, help="JSON file of path include/exclude rules (default: PATH_RULES_FILE, else built-in excludes)")
+    parser.add_argument('--max-workers', type=int, default=None, help="repositories analyzed in parallel")
+    parser.add_argument('--timeout', type=float, default=None, help="seconds allowed per repository")
+    parser.add_argument('--max-repo-mb', type=float, default=None, help="skip repositories larger than this (GitHub's size)")
+    parser.add_argument('--degraded-repo-mb', type=float, default=None, help="only analyze the default branch of repositories larger than this")
+    parser.add_argument('--telemetry-log', default=None, help="append the run's timings as a JSON line here ('-' for stderr)")
+    parser.add_argument('--profile-dir', default=None, help="write cProfile dumps of repository analyses here")
+    args = parser.parse_args()
+
+    output_format = args.format or ('parquet' if args.output.endswith('.parquet') else 'jsonl')
+    if output_format == 'parquet' and args.output == '-':
+        parser.error("Parquet output needs --output FILE")
+    if args.year is not None:
+        if args.since or args.until:
+            parser.error("--year can't be combined with --since/--until")
+        args.since = datetime(args.year, 1, 1, tzinfo=timezone.utc)
+        args.until = datetime(args.year + 1, 1, 1, tzinfo=timezone.utc)
+
+    path_rules = load_rules(args.path_rules) if args.path_rules else None
+    if args.usernames:
+        token = os.environ.get('GITHUB_TOKEN')
+        if not token:
+            parser.error("--usernames needs a GITHUB_TOKEN environment variable")
+        emails = read_identities(args.emails) if args.emails else {}
+        rows = analyze_users(
+            read_usernames(args.usernames),
+            emails,
+            token,
+            repo_cache=RepoCache(),
+            max_workers=args.max_workers,
+            timeout=args.timeout,
+            include_months=args.months,
+            since=args.since,
+            until=args.until,
+            include_files=args.files,
+            path_rules=path_rules,
+            max_size_kb=int(args.max_repo_mb * 1024) if args.max_repo_mb else None,
+            degraded_size_kb=int(args.degraded_repo_mb * 1024) if args.degraded_repo_mb else None
+        )
+    else:
+        if not args.identities:
+            parser.error("--repos-dir needs --identities")
+        rows = analyze_local_repos(
+            find_local_repos(args.repos_dir),
+            read_identities(args.identities),
+            max_workers=args.max_workers,
+            timeout=args.timeout,
+            include_months=args.months,
+            since=args.since,
+            until=args.until,
+            include_files=args.files,
+            path_rules=path_rules
+        )
+
+    failures = 0
+
+    def counted(rows: Iterator[Dict]) -> Iterator[Dict]:
+        nonlocal failures
+        for row in rows:
+            if row.get('error') and not row.get('skipped'):
+                failures += 1
+            yield row
+
+    writer = write_parquet if output_format == 'parquet' else write_jsonl
+    with telemetry.start_trace('batch', profile_dir=args.profile_dir, log_path=args.telemetry_log) as trace:
+        count = writer(counted(rows), args.output)
+    stages = ', '.join(f"{stage} {totals['seconds']:.1f}s" for stage, totals in trace.stages().items())
+    print(f"Wrote {count} rows, {failures} failed in {trace.seconds:.1f}s ({stages})", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
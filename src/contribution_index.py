@@ -0,0 +1,112 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List
+
+import telemetry
+from database import Database
+from github_client import GitHubClient
+from timeseries import series_from_days
+
+
+def identity_key(username: str, author_emails: List[str], path_rules: str = '') -> str:
+    """Stable key for the set of identities (login plus emails) commits are matched on.
+
+    ``path_rules`` is the fingerprint of the path rules commits are counted
+    under, so changing the rules starts a fresh index instead of mixing counts.
+    """
+    identities = sorted({username.lower(), *(email.strip().lower() for email in author_emails if email.strip())})
+    if path_rules:
+        identities.append(f'rules:{path_rules}')
+    return hashlib.sha256('\n'.join(identities).encode()).hexdigest()[:16]
+
+
+class ContributionIndex:
+    """Incremental analysis on top of the per-commit index kept in ``Database``.
+
+    Each repository remembers the ref tips it was last analyzed at. A new
+    analysis only walks commits beyond that frontier, stores them, and
+    rebuilds the repository's totals from every indexed commit.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def analyze_repos(self,
+                      client: GitHubClient,
+                      username: str,
+                      repos: List[Dict],
+                      author_emails: List[str],
+                      include_months: bool = False,
+                      **pool_options) -> Iterator[Dict]:
+        """Like ``GitHubClient.analyze_repos``, but only walking unindexed history.
+
+        ``pool_options`` (``max_workers``, ``timeout``, ``progress_callback``,
+        ``max_size_kb``, ``degraded_size_kb``) are passed through to the client.
+        """
+        identity = identity_key(username, author_emails, client.path_rules.fingerprint())
+        with telemetry.span('load_frontiers'):
+            frontiers = self.db.get_repo_frontiers(identity, [repo['full_name'] for repo in repos])
+        results = client.analyze_repos(
+            username,
+            repos,
+            author_emails,
+            exclude_shas=frontiers,
+            collect_commits=True,
+            **pool_options
+        )
+        for contribution in results:
+            yield self._merge(contribution, identity, include_months)
+
+    def _merge(self, contribution: Dict, identity: str, include_months: bool) -> Dict:
+        repo = contribution['full_name']
+        new_commits = contribution.pop('commits', [])
+        heads = contribution.pop('heads', None)
+
+        with telemetry.span('store_commits', repo=repo):
+            stored = 'error' not in contribution and self.db.store_repo_commits(repo, identity, new_commits, heads)
+        with telemetry.span('rebuild_totals', repo=repo):
+            days = self.db.get_indexed_contributions(repo, identity)
+        if not stored:
+            # The frontier did not move, so these commits will be walked again
+            # next time; count them now without persisting them
+            for commit in new_commits:
+                day = datetime.fromtimestamp(commit['timestamp'], tz=timezone.utc).strftime('%Y-%m-%d')
+                bucket = days.setdefault(day, {'added': 0, 'deleted': 0})
+                bucket['added'] += commit['added']
+                bucket['deleted'] += commit['deleted']
+
+        merged = {
+            'repository': contribution['repository'],
+            'full_name': repo,
+            **buckets_from_days(days, include_months)
+        }
+        for key in ('error', 'skipped', 'degraded'):
+            if key in contribution:
+                merged[key] = contribution[key]
+        return merged
+
+
+def buckets_from_days(days: Dict[str, Dict], include_months: bool = False) -> Dict:
+    """Roll ``{'YYYY-MM-DD': {'added', 'deleted'}}`` up into the analysis result shape."""
+    def bucket(added: int, deleted: int) -> Dict:
+        return {'added_lines': added, 'deleted_lines': deleted, 'total_lines': added - deleted}
+
+    months: Dict[str, Dict] = {}
+    for day, counts in days.items():
+        month = months.setdefault(day[:7], {'added': 0, 'deleted': 0})
+        month['added'] += counts['added']
+        month['deleted'] += counts['deleted']
+
+    years: Dict[int, Dict] = {}
+    for month, counts in months.items():
+        year = years.setdefault(int(month[:4]), bucket(0, 0))
+        year['added_lines'] += counts['added']
+        year['deleted_lines'] += counts['deleted']
+        year['total_lines'] += counts['added'] - counts['deleted']
+
+    added = sum(counts['added'] for counts in months.values())
+    deleted = sum(counts['deleted'] for counts in months.values())
+    result = {**bucket(added, deleted), 'years': years, 'weekly': series_from_days(days)}
+    if include_months:
+        result['months'] = {month: bucket(counts['added'], counts['deleted']) for month, counts in sorted(months.items())}
+    return result
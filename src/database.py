@@ -1,11 +1,23 @@
-from pymongo import MongoClient, DESCENDING
-from typing import Dict, List, Optional
+from pymongo import MongoClient, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import Dict, Iterable, List, Optional
 from datetime import datetime
+import os
+import numpy as np
 import streamlit as st
+from ranking import Leaderboard, SeriesIndex
+from search_index import UsernamePrefixIndex
+from timeseries import ROLLING_PERIODS, YEAR_PERIOD, encode_series, period_range
+
+# How long sidebar reads may be served from cache when another process wrote
+READ_CACHE_TTL = 60
+# Upserts sent per round trip by bulk_store_user_stats
+DEFAULT_BULK_BATCH_SIZE = 500
 
 class Database:
-    def __init__(self):
-        mongodb_uri = st.secrets["MONGODB_URI"]
+    def __init__(self, mongodb_uri: Optional[str] = None):
+        # Command-line tools pass the URI or set MONGODB_URI; the app reads its secrets
+        mongodb_uri = mongodb_uri or os.environ.get("MONGODB_URI") or st.secrets["MONGODB_URI"]
         if not mongodb_uri:
             raise ValueError("MongoDB URI not found in secrets")
         
@@ -15,30 +27,44 @@ class Database:
         
         # Create indexes
         self.users.create_index([("username", 1)], unique=True)
-        self.users.create_index([("total_net", DESCENDING)])
+        # Normalized key so case-insensitive exact and prefix search can use an index
+        self.users.create_index([("username_lower", 1)])
+        self.users.update_many(
+            {"username_lower": {"$exists": False}},
+            [{"$set": {"username_lower": {"$toLower": "$username"}}}]
+        )
+        self.usernames = UsernamePrefixIndex(self.users)
+        self.users.create_index([("all_time.total_net", DESCENDING)])
+        # Lets the materialized leaderboard pick up other processes' writes incrementally
+        self.users.create_index([("last_updated", 1)])
+        self.leaderboard = Leaderboard(self.users)
+        # Rolling periods are summed from every user's series, kept in memory the same way
+        self.series_index = SeriesIndex(self.users)
+        
+        # Per-commit contribution index, so re-analyses only walk new history
+        self.commits = self.db.commits
+        self.repo_frontiers = self.db.repo_frontiers
+        self.commits.create_index([("repo", 1), ("identity", 1), ("sha", 1)], unique=True)
+        self.repo_frontiers.create_index([("identity", 1), ("repo", 1)], unique=True)
 
     def store_user_stats(self, 
                         username: str, 
                         stats_all_time: Dict,
-                        stats_2024: Dict,
-                        avatar_url: Optional[str] = None) -> bool:
-        """Store user statistics if they don't exist or update if changed"""
+                        periods: Optional[Dict[str, Dict]] = None,
+                        avatar_url: Optional[str] = None,
+                        series: Optional[Dict] = None) -> bool:
+        """
+        Store user statistics if they don't exist or update if changed
         
-        doc = {
-            "username": username,
-            "all_time": {
-                "total_added": stats_all_time["total_added"],
-                "total_deleted": stats_all_time["total_deleted"],
-                "total_net": stats_all_time["total_net"]
-            },
-            "year_2024": {
-                "total_added": stats_2024["total_added"],
-                "total_deleted": stats_2024["total_deleted"],
-                "total_net": stats_2024["total_net"]
-            },
-            "avatar_url": avatar_url,
-            "last_updated": datetime.utcnow()
-        }
+        Args:
+            username (str): GitHub username
+            stats_all_time (Dict): ``total_added``/``total_deleted``/``total_net`` over all time
+            periods (Dict): The same totals keyed by period field, e.g. ``year_2024``
+            avatar_url (str): Avatar shown on the leaderboard
+            series (Dict): The user's weekly series (see ``timeseries``), for rolling periods
+        """
+        
+        doc = _user_doc(username, stats_all_time, periods, avatar_url, series)
         
         try:
             self.users.update_one(
@@ -46,31 +72,161 @@ class Database:
                 {"$set": doc},
                 upsert=True
             )
-            return True
+            self._after_write([doc])
         except Exception as e:
             print(f"Error storing user stats: {e}")
             return False
+        return True
 
-    def get_leaderboard(self, period: str = 'all_time', limit: int = 10) -> List[Dict]:
-        """Get top contributors by net lines for a specific period"""
-        sort_field = f"{period}.total_net"
+    def bulk_store_user_stats(self, records: Iterable[Dict], batch_size: int = DEFAULT_BULK_BATCH_SIZE) -> List[Dict]:
+        """
+        Upsert many users' statistics in batched, unordered bulk writes
         
-        try:
-            results = self.users.find(
-                {},
-                {
-                    "username": 1,
-                    f"{period}": 1,
-                    "avatar_url": 1,
-                    "_id": 0
-                }
-            ).sort(sort_field, DESCENDING).limit(limit)
+        Args:
+            records (Iterable[Dict]): Items with ``username`` and ``all_time`` stats,
+                any ``year_YYYY`` period stats (as for ``store_user_stats``) and an
+                optional ``avatar_url`` and weekly ``series``
+            batch_size (int): Number of upserts sent per round trip
             
-            return list(results)
+        Returns:
+            list: One ``{"username", "ok", "error"}`` report per input record, in input order
+        """
+        reports = []
+        batch = []
+        
+        for record in records:
+            if not isinstance(record, dict):
+                reports.append({"username": None, "ok": False, "error": f"Invalid record: expected an object, got {type(record).__name__}"})
+                continue
+            report = {"username": record.get("username"), "ok": False, "error": None}
+            reports.append(report)
+            try:
+                periods = {key: stats for key, stats in record.items() if YEAR_PERIOD.match(key)}
+                doc = _user_doc(record["username"], record["all_time"], periods, record.get("avatar_url"), record.get("series"))
+            except (KeyError, TypeError) as e:
+                report["error"] = f"Invalid record: missing {e}"
+                continue
+            batch.append((report, doc))
+            if len(batch) >= batch_size:
+                self._write_batch(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+        
+        return reports
+
+    def _write_batch(self, batch: List[tuple]):
+        operations = [UpdateOne({"username": doc["username"]}, {"$set": doc}, upsert=True) for _, doc in batch]
+        failed = {}
+        try:
+            self.users.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Unordered writes carry on past failures; map each one back to its record
+            failed = {error["index"]: error.get("errmsg", "write failed") for error in e.details.get("writeErrors", [])}
+        except Exception as e:
+            failed = {index: str(e) for index in range(len(batch))}
+        
+        written = []
+        for index, (report, doc) in enumerate(batch):
+            if index in failed:
+                report["error"] = failed[index]
+            else:
+                report["ok"] = True
+                written.append(doc)
+        self._after_write(written)
+
+    def _after_write(self, docs: List[Dict]):
+        """Keep in-memory rankings, typeahead and cached reads in step with stored users"""
+        for doc in docs:
+            self.leaderboard.record(doc["username"], doc)
+            self.series_index.record(doc["username"], doc)
+            self.usernames.add(doc["username"])
+        if docs:
+            invalidate_read_caches()
+
+    def get_leaderboard(self, period: str = 'all_time', limit: int = 10, offset: int = 0) -> List[Dict]:
+        """Get top contributors by net lines for a specific period, ``offset`` ranks down"""
+        if period in ROLLING_PERIODS:
+            start, end = period_range(period)
+            return [
+                {"username": row["username"], period: _totals(row), "avatar_url": row.get("avatar_url")}
+                for row in self.get_period_leaderboard(start, end, limit=limit, offset=offset)
+            ]
+        try:
+            ranked = self.leaderboard.top(period, offset=offset, limit=limit)
+            usernames = [username for username, _ in ranked]
+            docs = {
+                doc["username"]: doc
+                for doc in self.users.find(
+                    {"username": {"$in": usernames}},
+                    {
+                        "username": 1,
+                        f"{period}": 1,
+                        "avatar_url": 1,
+                        "_id": 0
+                    }
+                )
+            }
+            return [docs[username] for username in usernames if username in docs]
         except Exception as e:
             print(f"Error fetching leaderboard: {e}")
             return []
 
+    def get_user_rank(self, username: str, period: str = 'all_time') -> Optional[Dict]:
+        """Get a user's rank, the number of ranked users and their percentile for a period"""
+        try:
+            if period in ROLLING_PERIODS:
+                return self._window_rank(username, *period_range(period))
+            return self.leaderboard.rank(period, username)
+        except Exception as e:
+            print(f"Error fetching user rank: {e}")
+            return None
+
+    def get_period_leaderboard(self,
+                               start: Optional[datetime],
+                               end: Optional[datetime],
+                               limit: int = 10,
+                               offset: int = 0) -> List[Dict]:
+        """
+        Get top contributors by net lines between any two dates, from the weekly series
+        
+        Windows are whole weeks (see ``SeriesMatrix.window``). Users analyzed
+        before series were stored only appear once they are analyzed again.
+        
+        Returns:
+            list: ``{"username", "total_added", "total_deleted", "total_net", "avatar_url"}``, best first
+        """
+        try:
+            matrix = self.series_index.matrix()
+            rows = matrix.top(start, end, limit=offset + limit)[offset:]
+            avatars = {
+                doc["username"]: doc.get("avatar_url")
+                for doc in self.users.find(
+                    {"username": {"$in": [row["username"] for row in rows]}},
+                    {"username": 1, "avatar_url": 1, "_id": 0}
+                )
+            }
+            return [{**row, "avatar_url": avatars.get(row["username"])} for row in rows]
+        except Exception as e:
+            print(f"Error fetching period leaderboard: {e}")
+            return []
+
+    def _window_rank(self, username: str, start: Optional[datetime], end: Optional[datetime]) -> Optional[Dict]:
+        matrix = self.series_index.matrix()
+        added, deleted = matrix.window(start, end)
+        net = added - deleted
+        active = (added != 0) | (deleted != 0)
+        position = np.flatnonzero(matrix.usernames == username)
+        if not len(position) or not active[position[0]]:
+            return None
+        user_net = net[position[0]]
+        total = int(active.sum())
+        return {
+            "rank": int((active & (net > user_net)).sum()) + 1,
+            "total": total,
+            "percentile": 100.0 * int((active & (net < user_net)).sum()) / total
+        }
+
     def get_user_stats(self, username: str) -> Optional[Dict]:
         """Get stats for a specific user"""
         try:
@@ -82,25 +238,159 @@ class Database:
             print(f"Error fetching user stats: {e}")
             return None
 
-    def search_users(self, query: str, limit: int = 5) -> list:
+    def search_users(self, query: str, limit: int = 5, prefix: bool = False) -> list:
         """
-        Search for users by exact username match
+        Search for users by case-insensitive username, exact or by prefix
         
         Args:
-            query (str): The exact username to search for
+            query (str): The username (or start of it, with ``prefix``) to search for
             limit (int): Maximum number of results to return
+            prefix (bool): Match every username starting with ``query``
             
         Returns:
-            list: List of matching user stats
+            list: List of matching user stats, in username order
         """
+        key = query.strip().lower()
+        if not key:
+            return []
+        if prefix:
+            # A range on the normalized key walks the index in order; no regex involved
+            condition = {"$gte": key, "$lt": key + "\uffff"}
+        else:
+            condition = key
         try:
-            # Case-insensitive exact match search
-            users = self.db.users.find(
-                {"username": {"$regex": f"^{query}$", "$options": "i"}},
-                {"_id": 0},  # Exclude MongoDB _id field
+            users = self.users.find(
+                {"username_lower": condition},
+                {"_id": 0, "username_lower": 0},  # Exclude internal fields
                 limit=limit
-            )
+            ).sort("username_lower", 1)
             return list(users)
         except Exception as e:
             print(f"Error searching users: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    def suggest_usernames(self, prefix: str, limit: int = 5) -> List[str]:
+        """Get usernames starting with ``prefix`` from the in-memory typeahead index"""
+        try:
+            return self.usernames.suggest(prefix, limit=limit)
+        except Exception as e:
+            print(f"Error suggesting usernames: {e}")
+            return []
+
+    def get_repo_frontiers(self, identity: str, repos: List[str]) -> Dict[str, List[str]]:
+        """Get the ref tips each repository was last analyzed at for an author identity"""
+        try:
+            frontiers = self.repo_frontiers.find(
+                {"identity": identity, "repo": {"$in": repos}},
+                {"_id": 0, "repo": 1, "heads": 1}
+            )
+            return {frontier["repo"]: frontier["heads"] for frontier in frontiers}
+        except Exception as e:
+            print(f"Error fetching repo frontiers: {e}")
+            return {}
+
+    def store_repo_commits(self, repo: str, identity: str, commits: List[Dict], heads: List[str]) -> bool:
+        """Index newly walked commits and move the repository's frontier forward"""
+        try:
+            if commits:
+                self.commits.bulk_write([
+                    UpdateOne(
+                        {"repo": repo, "identity": identity, "sha": commit["sha"]},
+                        {"$set": {
+                            "author_name": commit["author_name"],
+                            "author_email": commit["author_email"],
+                            "timestamp": datetime.utcfromtimestamp(commit["timestamp"]),
+                            "added": commit["added"],
+                            "deleted": commit["deleted"]
+                        }},
+                        upsert=True
+                    )
+                    for commit in commits
+                ], ordered=False)
+            # Only advance the frontier once the commits behind it are stored
+            self.repo_frontiers.update_one(
+                {"repo": repo, "identity": identity},
+                {"$set": {"heads": heads, "last_updated": datetime.utcnow()}},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            print(f"Error storing repo commits: {e}")
+            return False
+
+    def get_indexed_contributions(self, repo: str, identity: str) -> Dict[str, Dict]:
+        """Sum indexed commits of a repository per day (``YYYY-MM-DD``)"""
+        try:
+            days = self.commits.aggregate([
+                {"$match": {"repo": repo, "identity": identity}},
+                {"$group": {
+                    "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+                    "added": {"$sum": "$added"},
+                    "deleted": {"$sum": "$deleted"}
+                }}
+            ])
+            return {day["_id"]: {"added": day["added"], "deleted": day["deleted"]} for day in days}
+        except Exception as e:
+            print(f"Error aggregating indexed commits: {e}")
+            return {}
+
+
+
+def _user_doc(username: str,
+              stats_all_time: Dict,
+              periods: Optional[Dict[str, Dict]] = None,
+              avatar_url: Optional[str] = None,
+              series: Optional[Dict] = None) -> Dict:
+    doc = {
+        "username": username,
+        "username_lower": username.lower(),
+        "all_time": _totals(stats_all_time),
+        "avatar_url": avatar_url,
+        "last_updated": datetime.utcnow()
+    }
+    for period, stats in (periods or {}).items():
+        if not YEAR_PERIOD.match(period):
+            raise ValueError(f"Stored periods must be named year_YYYY, got {period}")
+        doc[period] = _totals(stats)
+    if series is not None:
+        doc["series"] = encode_series(series)
+    return doc
+
+
+def _totals(stats: Dict) -> Dict:
+    return {
+        "total_added": stats["total_added"],
+        "total_deleted": stats["total_deleted"],
+        "total_net": stats["total_net"]
+    }
+
+
+@st.cache_resource
+def get_database() -> Database:
+    """Process-wide Database, so the Mongo connection pool and indexes are set up once"""
+    return Database()
+
+
+@st.cache_data(ttl=READ_CACHE_TTL, show_spinner=False)
+def cached_leaderboard(period: str = 'all_time', limit: int = 10) -> List[Dict]:
+    """``Database.get_leaderboard`` served from cache between writes"""
+    return get_database().get_leaderboard(period=period, limit=limit)
+
+
+@st.cache_data(ttl=READ_CACHE_TTL, show_spinner=False)
+def cached_user_rank(username: str, period: str = 'all_time') -> Optional[Dict]:
+    """``Database.get_user_rank`` served from cache between writes"""
+    return get_database().get_user_rank(username, period=period)
+
+
+@st.cache_data(ttl=READ_CACHE_TTL, show_spinner=False)
+def cached_search_users(query: str, limit: int = 5, prefix: bool = False) -> list:
+    """``Database.search_users`` served from cache between writes"""
+    return get_database().search_users(query, limit=limit, prefix=prefix)
+
+
+def invalidate_read_caches():
+    """Drop cached leaderboard and search results after user stats change"""
+    cached_leaderboard.clear()
+    cached_user_rank.clear()
+    cached_search_users.clear()
@@ -1,155 +1,663 @@
 import os
 import requests
-from typing import List, Dict, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import shutil
 import tempfile
-import git
 import subprocess
-from datetime import datetime
-import streamlit as st
+import threading
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+import telemetry
+from repo_cache import RepoCache, dir_size
+from scheduler import DEGRADED, Schedule, format_size
+from timeseries import empty_series
+from numstat import LOG_FORMAT, FileStats, aggregate, collect_records, parse_log
+from path_rules import PathRules, default_rules
+from http_cache import ResponseCache
+from rate_limit import RateLimiter
+from transport import ANONYMOUS, GITHUB_API_URL, cached_get, get_rate_limiter, get_response_cache, get_session
+
+# Largest page size the GitHub REST API allows
+REPOS_PER_PAGE = 100
 
 class GitHubClient:
-    def __init__(self, token: Optional[str] = None):
-        self.token = token or st.secrets.get('GITHUB_TOKEN')
+    def __init__(self,
+                 token: Optional[str] = None,
+                 repo_cache: Optional[RepoCache] = None,
+                 base_url: str = GITHUB_API_URL,
+                 session: Optional[requests.Session] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 path_rules: Optional[PathRules] = None):
+        self.token = None if token == ANONYMOUS else token or _default_token()
+        self.repo_cache = repo_cache
+        # Vendored, generated and lock files git leaves out of every walk
+        self.path_rules = path_rules or default_rules()
         self.headers = {
             'Authorization': f'token {self.token}' if self.token else '',
             'Accept': 'application/vnd.github.v3+json'
         }
-        self.base_url = "https://api.github.com"
+        self.base_url = base_url
+        # Connection-pooled, keep-alive transport shared by every client in the process
+        self.session = session or get_session()
+        # ETag/Last-Modified store so unchanged listings come back as free 304s
+        self.response_cache = response_cache or get_response_cache()
+        # Shared across clients so every caller of a token draws on the same budget
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self._authenticated_user: Optional[str] = None
 
     def get_user_repos(self, username: str) -> List[Dict]:
+        """List the repositories ``username`` owns or is affiliated with.
+
+        When ``username`` is the token's own account, the authenticated
+        endpoint's ``affiliation`` filter already limits results to repositories
+        the user owns, collaborates on or reaches through an organization, so
+        no per-repository collaborator lookups are needed. For anyone else the
+        public listing with ``type=all`` returns their owned and member repos.
+        """
+        if self.token and username.lower() == self.get_authenticated_user().lower():
+            url = f"{self.base_url}/user/repos"
+            params = {'affiliation': 'owner,collaborator,organization_member'}
+            public = False
+        else:
+            url = f"{self.base_url}/users/{username}/repos"
+            params = {'type': 'all'}
+            public = True
+        
         repos = []
         page = 1
-        
-        # First get owned repositories
         while True:
-            if self.token:
-                # If we have a token, use the authenticated endpoint
-                url = f"{self.base_url}/user/repos"
-                params = {
-                    'per_page': 100,
-                    'page': page,
-                    'affiliation': 'owner,collaborator,organization_member'
-                }
-            else:
-                # Without token, use the public endpoint
-                url = f"{self.base_url}/users/{username}/repos"
-                params = {
-                    'per_page': 100,
-                    'page': page
-                }
-            
-            response = requests.get(
-                url,
-                headers=self.headers,
-                params=params
-            )
+            response = self._get(url, params={**params, 'per_page': REPOS_PER_PAGE, 'page': page}, public=public)
             response.raise_for_status()
             
             batch = response.json()
-            if not batch:
-                break
-                
-            # If using authenticated endpoint, filter for the specific username
-            if self.token:
-                batch = [repo for repo in batch 
-                        if repo['owner']['login'] == username 
-                        or username in [collab['login'] for collab in self.get_collaborators(repo['full_name'])]]
-            
             repos.extend(batch)
+            # A short page is the last one; no need to ask for an empty page
+            if len(batch) < REPOS_PER_PAGE:
+                break
             page += 1
         
         return repos
 
-    def get_collaborators(self, repo_full_name: str) -> List[Dict]:
-        """Get list of collaborators for a repository"""
-        try:
-            response = requests.get(
-                f"{self.base_url}/repos/{repo_full_name}/collaborators",
-                headers=self.headers
-            )
-            response.raise_for_status()
-            return response.json()
-        except:
-            return []
-
     def get_authenticated_user(self) -> str:
         """Get the username of the authenticated user"""
         if not self.token:
             raise ValueError("GitHub token is required")
         
-        response = requests.get(
-            f"{self.base_url}/user",
-            headers=self.headers
+        # The token's owner never changes, so only ask once per client
+        if self._authenticated_user is None:
+            response = self._get(f"{self.base_url}/user")
+            response.raise_for_status()
+            self._authenticated_user = response.json()['login']
+        return self._authenticated_user
+
+    def _get(self, url: str, params: Optional[Dict] = None, public: bool = False) -> requests.Response:
+        return cached_get(
+            url,
+            headers=self.headers,
+            params=params,
+            session=self.session,
+            cache=self.response_cache,
+            limiter=self.rate_limiter,
+            public=public
+        )
+
+    def analyze_repos(self,
+                      username: str,
+                      repos: List[Dict],
+                      author_emails: List[str],
+                      include_months: bool = False,
+                      max_workers: Optional[int] = None,
+                      timeout: Optional[float] = None,
+                      progress_callback: Optional[Callable[[int, int, Dict, float], None]] = None,
+                      exclude_shas: Optional[Dict[str, List[str]]] = None,
+                      collect_commits: bool = False,
+                      max_size_kb: Optional[int] = None,
+                      degraded_size_kb: Optional[int] = None,
+                      since: Optional[datetime] = None,
+                      until: Optional[datetime] = None,
+                      include_files: bool = False) -> Iterator[Dict]:
+        """Analyze many repositories concurrently, yielding results as they complete.
+
+        ``repos`` are repository dicts as returned by ``get_user_repos``. Work is
+        spread over a thread pool (the heavy lifting happens in git subprocesses)
+        of ``max_workers`` threads, defaulting to the CPU count, largest
+        repository (by the API's ``size``) first. ``timeout`` caps the
+        wall-clock seconds spent on any one repository; a repository that
+        exceeds it is reported with an ``error`` entry. ``progress_callback``
+        is called as ``(completed, total, contribution, eta_seconds)`` after
+        each repository, ``eta_seconds`` being ``Schedule.eta``.
+        ``exclude_shas`` maps a repository ``full_name`` to the commits whose
+        history is already known (see ``analyze_repo_contributions``).
+
+        Repositories over ``max_size_kb`` are reported as skipped without
+        being cloned; those over ``degraded_size_kb`` only have their default
+        branch analyzed and come back marked ``degraded``.
+
+        ``since``/``until`` bound the analysis to a date range (see
+        ``analyze_repo_contributions``); repositories last pushed before
+        ``since`` are answered as empty without being cloned.
+        """
+        results = self.analyze_users_repos(
+            {username: repos},
+            {username: author_emails},
+            include_months=include_months,
+            max_workers=max_workers,
+            timeout=timeout,
+            progress_callback=progress_callback,
+            exclude_shas={username: exclude_shas} if exclude_shas else None,
+            collect_commits=collect_commits,
+            max_size_kb=max_size_kb,
+            degraded_size_kb=degraded_size_kb,
+            since=since,
+            until=until,
+            include_files=include_files
         )
-        response.raise_for_status()
-        return response.json()['login']
+        for _, contribution in results:
+            yield contribution
+
+    def analyze_users_repos(self,
+                            user_repos: Dict[str, List[Dict]],
+                            author_emails: Dict[str, List[str]],
+                            include_months: bool = False,
+                            max_workers: Optional[int] = None,
+                            timeout: Optional[float] = None,
+                            progress_callback: Optional[Callable[[int, int, Dict, float], None]] = None,
+                            exclude_shas: Optional[Dict[str, Dict[str, List[str]]]] = None,
+                            collect_commits: bool = False,
+                            max_size_kb: Optional[int] = None,
+                            degraded_size_kb: Optional[int] = None,
+                            since: Optional[datetime] = None,
+                            until: Optional[datetime] = None,
+                            include_files: bool = False) -> Iterator[Tuple[str, Dict]]:
+        """``analyze_repos`` for several users at once, yielding ``(username, contribution)`` pairs.
 
-    def analyze_repo_contributions(self, username: str, repo_name: str, repo_url: str, author_emails: List[str], year: Optional[int] = None) -> Dict:
+        ``user_repos``, ``author_emails`` and ``exclude_shas`` are keyed by
+        username. Every user's repositories share one schedule and pool, so a
+        user with a single huge repository doesn't hold up the others.
+        """
+        if since is not None and collect_commits:
+            raise ValueError("Date-bounded analyses can't feed the commit index")
+        exclude_shas = exclude_shas or {}
+        max_workers = max_workers or os.cpu_count() or 4
+        usernames = [username for username, repos in user_repos.items() for _ in repos]
+        repos = [repo for repos in user_repos.values() for repo in repos]
+        schedule = Schedule(repos, max_workers, max_size_kb=max_size_kb, degraded_size_kb=degraded_size_kb, usernames=usernames)
+        total = len(repos)
+        completed = 0
+
+        def finished(username: str, contribution: Dict) -> Tuple[str, Dict]:
+            nonlocal completed
+            completed += 1
+            if progress_callback is not None:
+                progress_callback(completed, total, contribution, schedule.eta())
+            return username, contribution
+
+        for task in schedule.skipped():
+            repo = task['repo']
+            message = f"Skipped: {format_size(task['size_kb'])} is over the {format_size(max_size_kb)} limit"
+            yield finished(task['username'], {**_failed_contribution(repo['name'], repo.get('full_name'), message, include_months), 'skipped': True})
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    telemetry.propagate(self._analyze_task),
+                    schedule,
+                    task,
+                    author_emails.get(task['username'], []),
+                    include_months=include_months,
+                    timeout=timeout,
+                    exclude_shas=exclude_shas.get(task['username'], {}).get(task['repo'].get('full_name')),
+                    collect_commits=collect_commits,
+                    since=since,
+                    until=until,
+                    include_files=include_files
+                ): task['username']
+                for task in schedule.runnable()
+            }
+            try:
+                for future in as_completed(futures):
+                    yield finished(futures[future], future.result())
+            finally:
+                # Don't start queued repositories if the consumer stops early
+                for future in futures:
+                    future.cancel()
+
+    def _analyze_task(self, schedule: Schedule, task: Dict, author_emails: List[str], **options) -> Dict:
+        repo = task['repo']
+        if not pushed_since(repo, options.get('since')):
+            telemetry.count('repos_not_pushed_since')
+            schedule.skip(task)
+            return _empty_contribution(repo['name'], repo.get('full_name'), options.get('include_months', False))
+        branch = repo['default_branch'] if task['mode'] == DEGRADED else None
+        schedule.start(task)
+        try:
+            contribution = self.analyze_repo_contributions(
+                task['username'],
+                repo['name'],
+                repo['clone_url'],
+                author_emails,
+                full_name=repo.get('full_name'),
+                branch=branch,
+                **options
+            )
+        finally:
+            schedule.finish(task)
+        if branch:
+            contribution['degraded'] = True
+        return contribution
+
+    def analyze_repo_contributions(self,
+                                   username: str,
+                                   repo_name: str,
+                                   repo_url: str,
+                                   author_emails: List[str],
+                                   include_months: bool = False,
+                                   full_name: Optional[str] = None,
+                                   timeout: Optional[float] = None,
+                                   exclude_shas: Optional[List[str]] = None,
+                                   collect_commits: bool = False,
+                                   branch: Optional[str] = None,
+                                   since: Optional[datetime] = None,
+                                   until: Optional[datetime] = None,
+                                   include_files: bool = False) -> Dict:
+        """Clone a repository once and bucket the author's line changes by period.
+
+        The top-level ``added_lines``/``deleted_lines``/``total_lines`` cover all
+        time. ``years`` maps each calendar year to the same three counters and,
+        when ``include_months`` is set, ``months`` does the same keyed by ``YYYY-MM``.
+        ``weekly`` holds the same history as a weekly series (see ``timeseries``).
+        With ``include_files``, ``files`` breaks the lines down by extension,
+        top-level directory and file (see ``numstat.FileStats.breakdown``).
+        Use ``period_contribution`` to pull a flat row for a given year.
+        
+        With a ``repo_cache`` configured the repository is read from its
+        cached mirror (keyed by ``full_name``) instead of a throwaway clone.
+        ``timeout`` bounds the whole clone/fetch and walk, in seconds.
+        
+        For incremental analysis, commits reachable from ``exclude_shas`` are
+        skipped, so the result only covers newer history. ``collect_commits``
+        adds the per-commit rows under ``commits`` and the current ref tips
+        under ``heads``, which is the frontier to exclude next time.
+        
+        With ``branch`` only that branch is fetched and walked, the degraded
+        mode for repositories too large to analyze in full.
+        
+        Paths excluded by the client's ``path_rules`` are never diffed and
+        don't count.
+        
+        ``since``/``until`` (naive datetimes are UTC) only count commits
+        made in that range. Unless a cached mirror already exists, only the
+        history from ``since`` on is fetched, plus the parents of the oldest
+        fetched commits so those diff correctly; the transfer falls back to
+        full history if the server refuses the shallow clone. Bounded results
+        are partial, so they can't be combined with ``collect_commits``.
+        """
+        if since is not None and collect_commits:
+            raise ValueError("Date-bounded analyses can't feed the commit index")
         if self.token:
             repo_url = repo_url.replace('https://', f'https://{self.token}@')
-        with tempfile.TemporaryDirectory() as temp_dir:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with telemetry.span('repo', profile=True, repo=full_name or repo_name):
             try:
-                repo = git.Repo.clone_from(repo_url, temp_dir)
-                repo.git.fetch('--all')
-                
-                added = 0
-                deleted = 0
-                
-                remote_refs = [ref for ref in repo.remote().refs]
-                
-                for ref in remote_refs:
-                    try:
-                        repo.git.checkout(ref, force=True)
-                        
-                        # Base git command
-                        git_command = [
-                            'git', 'log',
-                            '--all',
-                            '--pretty=tformat:',
-                            '--numstat'
-                        ]
-                        
-                        # Add year filter if specified (year is not None and not 'All time')
-                        if year is not None:
-                            git_command.extend(['--since', f'{year}-01-01', '--until', f'{year}-12-31'])
-                        
-                        # Add author parameters for username and all emails
-                        git_command.extend(['--author', username])
-                        for email in author_emails:
-                            git_command.extend(['--author', email])
-                        
-                        result = subprocess.run(
-                            git_command,
-                            cwd=temp_dir,
-                            capture_output=True,
-                            text=True
+                with self._local_repo(repo_url, full_name or repo_name, deadline, branch, since) as repo_dir:
+                    return {
+                        'repository': repo_name,
+                        'full_name': full_name or repo_name,
+                        **_walk_contributions(
+                            repo_dir,
+                            username,
+                            author_emails,
+                            include_months=include_months,
+                            exclude_shas=exclude_shas,
+                            collect_commits=collect_commits,
+                            deadline=deadline,
+                            branch=branch,
+                            since=since,
+                            until=until,
+                            include_files=include_files,
+                            pathspecs=self.path_rules.pathspecs(full_name or repo_name)
                         )
-                        
-                        for line in result.stdout.split('\n'):
-                            if line.strip():
-                                try:
-                                    additions, deletions, _ = line.split('\t')
-                                    if additions.isdigit() and deletions.isdigit():
-                                        added += int(additions)
-                                        deleted += int(deletions)
-                                except ValueError:
-                                    continue
-                
-                    except Exception as branch_error:
-                        continue
-                
-                return {
-                    'repository': repo_name,
-                    'added_lines': added,
-                    'deleted_lines': deleted,
-                    'total_lines': added - deleted
-                }
-                
+                    }
+            except subprocess.TimeoutExpired:
+                telemetry.count('repos_timed_out')
+                return _failed_contribution(repo_name, full_name, f'Timed out after {timeout:g}s', include_months)
             except Exception as e:
-                return {
-                    'repository': repo_name,
-                    'added_lines': 0,
-                    'deleted_lines': 0,
-                    'total_lines': 0,
-                    'error': str(e)
-                }
\ No newline at end of file
+                telemetry.count('repos_failed')
+                return _failed_contribution(repo_name, full_name, self._describe_error(e), include_months)
+
+    def _describe_error(self, error: Exception) -> str:
+        """Turn a failed git invocation into a message that never leaks the token."""
+        message = _describe_git_error(error)
+        if self.token:
+            message = message.replace(self.token, '***')
+        return message
+
+    @contextmanager
+    def _local_repo(self,
+                    repo_url: str,
+                    full_name: str,
+                    deadline: Optional[float] = None,
+                    branch: Optional[str] = None,
+                    since: Optional[datetime] = None):
+        """Yield the path of a bare repository holding every branch of ``repo_url`` (or just ``branch``).
+
+        With ``since``, a throwaway clone only holds history from then on.
+        """
+        # A shallow mirror would be useless to later full analyses, so
+        # bounded ones only reuse mirrors that already exist
+        if self.repo_cache is not None and (since is None or self.repo_cache.has_mirror(full_name)):
+            with self.repo_cache.mirror(full_name, repo_url, timeout=_remaining(deadline), branch=branch) as path:
+                yield path
+            return
+        with tempfile.TemporaryDirectory() as temp_dir:
+            repo_dir = os.path.join(temp_dir, 'repo.git')
+            # A bare clone carries every branch as a local ref and never
+            # materializes a working tree, so nothing has to be checked out
+            single_branch = ['--single-branch', '--branch', branch] if branch else []
+            with telemetry.span('clone', repo=full_name):
+                if since is None or not _shallow_clone(repo_url, repo_dir, since, single_branch, deadline):
+                    subprocess.run(
+                        ['git', 'clone', '--bare', '--quiet', *single_branch, repo_url, repo_dir],
+                        check=True,
+                        capture_output=True,
+                        timeout=_remaining(deadline)
+                    )
+            telemetry.count('bytes_fetched', dir_size(repo_dir))
+            yield repo_dir
+
+
+def pushed_since(repo: Dict, since: Optional[datetime]) -> bool:
+    """Whether ``repo`` (as listed by the API) may have commits from ``since`` on, judging by ``pushed_at``."""
+    if since is None or not repo.get('pushed_at'):
+        return True
+    pushed_at = datetime.fromisoformat(repo['pushed_at'].replace('Z', '+00:00'))
+    return pushed_at >= _utc(since)
+
+
+def _shallow_clone(repo_url: str, repo_dir: str, since: datetime, clone_options: List[str], deadline: Optional[float]) -> bool:
+    """Bare-clone only the history from ``since`` on into ``repo_dir``; False if git refused."""
+    try:
+        subprocess.run(
+            # Shallow clones default to a single branch; ask for every one unless told otherwise
+            ['git', 'clone', '--bare', '--quiet', f'--shallow-since={_git_date(since)}',
+             *(clone_options or ['--no-single-branch']), repo_url, repo_dir],
+            check=True,
+            capture_output=True,
+            timeout=_remaining(deadline)
+        )
+        if os.path.exists(os.path.join(repo_dir, 'shallow')):
+            # The oldest commits fetched are shallow roots, which numstat would
+            # diff against an empty tree; one more level of parents fixes that
+            heads = subprocess.run(
+                ['git', 'for-each-ref', '--format=+%(refname):%(refname)', 'refs/heads'],
+                cwd=repo_dir, check=True, capture_output=True, text=True, timeout=_remaining(deadline)
+            ).stdout.split()
+            subprocess.run(
+                ['git', 'fetch', '--quiet', '--no-tags', '--deepen=1', 'origin', *heads],
+                cwd=repo_dir, check=True, capture_output=True, timeout=_remaining(deadline)
+            )
+        telemetry.count('shallow_clones')
+        return True
+    except subprocess.CalledProcessError:
+        # No commit newer than ``since``, or a server without shallow support
+        telemetry.count('shallow_fallbacks')
+        shutil.rmtree(repo_dir, ignore_errors=True)
+        return False
+
+
+def _default_token() -> Optional[str]:
+    """``GITHUB_TOKEN`` from the environment, else from Streamlit secrets when running the app."""
+    token = os.environ.get('GITHUB_TOKEN')
+    if token:
+        return token
+    try:
+        import streamlit as st
+        return st.secrets.get('GITHUB_TOKEN')
+    except Exception:
+        # Not installed, or no secrets file outside the app
+        return None
+
+
+def analyze_local_repo(repo_dir: str,
+                       username: str,
+                       author_emails: List[str],
+                       repo_name: Optional[str] = None,
+                       include_months: bool = False,
+                       timeout: Optional[float] = None,
+                       exclude_shas: Optional[List[str]] = None,
+                       collect_commits: bool = False,
+                       since: Optional[datetime] = None,
+                       until: Optional[datetime] = None,
+                       include_files: bool = False,
+                       path_rules: Optional[PathRules] = None) -> Dict:
+    """Analyze a repository already cloned at ``repo_dir`` (bare or not).
+
+    Same result shape and options as ``GitHubClient.analyze_repo_contributions``,
+    without any GitHub access. ``repo_name`` defaults to the directory name
+    and is what ``path_rules`` (default: ``path_rules.default_rules()``)
+    overrides are matched against.
+    """
+    path_rules = path_rules or default_rules()
+    repo_name = repo_name or os.path.basename(os.path.normpath(repo_dir)).removesuffix('.git')
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    with telemetry.span('repo', profile=True, repo=repo_name):
+        try:
+            return {
+                'repository': repo_name,
+                'full_name': repo_name,
+                **_walk_contributions(
+                    repo_dir,
+                    username,
+                    author_emails,
+                    include_months=include_months,
+                    exclude_shas=exclude_shas,
+                    collect_commits=collect_commits,
+                    deadline=deadline,
+                    since=since,
+                    until=until,
+                    include_files=include_files,
+                    pathspecs=path_rules.pathspecs(repo_name)
+                )
+            }
+        except subprocess.TimeoutExpired:
+            telemetry.count('repos_timed_out')
+            return _failed_contribution(repo_name, None, f'Timed out after {timeout:g}s', include_months)
+        except Exception as e:
+            telemetry.count('repos_failed')
+            return _failed_contribution(repo_name, None, _describe_git_error(e), include_months)
+
+
+def _walk_contributions(repo_dir: str,
+                        username: str,
+                        author_emails: List[str],
+                        include_months: bool = False,
+                        exclude_shas: Optional[List[str]] = None,
+                        collect_commits: bool = False,
+                        deadline: Optional[float] = None,
+                        branch: Optional[str] = None,
+                        since: Optional[datetime] = None,
+                        until: Optional[datetime] = None,
+                        include_files: bool = False,
+                        pathspecs: Optional[List[str]] = None) -> Dict:
+    """Walk the author's history in ``repo_dir`` (every ref, or only ``branch``) and aggregate it.
+
+    ``since``/``until`` limit the walk to commits made in that range and
+    ``pathspecs`` to changes of matching paths. Raises on git failures.
+    """
+    git_command = [
+        # Unquoted non-ASCII paths, so file breakdowns see real names and extensions
+        'git', '-c', 'core.quotePath=false', 'log',
+        # Single walk over every commit reachable from any ref; git emits
+        # each commit once no matter how many branches contain it
+        f'refs/heads/{branch}' if branch else '--all',
+        f'--pretty=tformat:{LOG_FORMAT}',
+        '--numstat'
+    ]
+    
+    if since is not None:
+        git_command.append(f'--since={_git_date(since)}')
+    if until is not None:
+        git_command.append(f'--until={_git_date(until)}')
+    
+    # Add author parameters for username and all emails
+    git_command.extend(['--author', username])
+    for email in author_emails:
+        git_command.extend(['--author', email])
+    
+    # Git skips diffing excluded paths altogether. Full history, as without
+    # pathspecs: by default git would prune side branches of merges that leave
+    # the matched paths as on one parent, dropping commits that still count
+    if pathspecs:
+        git_command.append('--full-history')
+    
+    # Stop at history that was already analyzed
+    if exclude_shas:
+        with telemetry.span('frontier'):
+            known = _existing_commits(repo_dir, exclude_shas, deadline)
+        if known:
+            git_command.append('--not')
+            git_command.extend(known)
+    
+    if pathspecs:
+        git_command.append('--')
+        git_command.extend(pathspecs)
+    
+    # Parse and aggregate chunk by chunk while git is still writing, so memory
+    # use doesn't grow with the size of the log; the span covers both
+    files = FileStats() if include_files else None
+    commits: List[Dict] = []
+    with telemetry.span('git_log'):
+        with _stream_output(git_command, repo_dir, deadline) as output:
+            frames = parse_log(output, files=files, details=collect_commits)
+            if collect_commits:
+                frames = collect_records(frames, commits)
+            aggregated = aggregate(frames, include_months)
+            if files is not None:
+                aggregated['files'] = files.breakdown()
+    
+    if collect_commits:
+        aggregated['commits'] = commits
+        with telemetry.span('ref_heads'):
+            aggregated['heads'] = _ref_heads(repo_dir, deadline, branch)
+    return aggregated
+
+
+def _describe_git_error(error: Exception) -> str:
+    """Prefer the last line of git's stderr over the exception's command dump."""
+    if isinstance(error, subprocess.CalledProcessError) and error.stderr:
+        stderr = error.stderr.decode(errors='replace') if isinstance(error.stderr, bytes) else error.stderr
+        return stderr.strip().splitlines()[-1]
+    return str(error)
+
+
+def _utc(moment: datetime) -> datetime:
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _git_date(moment: datetime) -> str:
+    return _utc(moment).isoformat()
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left before ``deadline`` (a ``time.monotonic`` value), or None if unbounded."""
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.001)
+
+
+def _existing_commits(repo_dir: str, shas: List[str], deadline: Optional[float] = None) -> List[str]:
+    """Keep only the SHAs that still exist in the repository (force pushes can drop them)."""
+    if not shas:
+        return []
+    result = subprocess.run(
+        ['git', 'cat-file', '--batch-check=%(objectname) %(objecttype)'],
+        cwd=repo_dir,
+        input='\n'.join(shas) + '\n',
+        capture_output=True,
+        text=True,
+        timeout=_remaining(deadline)
+    )
+    return [line.split()[0] for line in result.stdout.splitlines() if line.endswith(' commit')]
+
+
+def _ref_heads(repo_dir: str, deadline: Optional[float] = None, branch: Optional[str] = None) -> List[str]:
+    """Commit SHAs at the tip of every branch and tag (or of ``branch``), i.e. everything the walk started from."""
+    refs = [f'refs/heads/{branch}'] if branch else ['refs/heads', 'refs/tags']
+    result = subprocess.run(
+        ['git', 'for-each-ref', '--format=%(objectname) %(*objectname)', *refs],
+        cwd=repo_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+        timeout=_remaining(deadline)
+    )
+    # Annotated tags report the tag object first and the peeled commit second
+    return sorted({line.split()[-1] for line in result.stdout.splitlines() if line.strip()})
+
+
+@contextmanager
+def _stream_output(command: List[str], cwd: str, deadline: Optional[float] = None):
+    """Run ``command`` and yield its stdout as a binary stream to be read incrementally.
+
+    Raises ``subprocess.TimeoutExpired`` if ``deadline`` passes before the
+    command finishes and ``subprocess.CalledProcessError`` if it fails.
+    """
+    with tempfile.TemporaryFile() as stderr:
+        # stderr goes to a file so a chatty command can never block on a full pipe
+        process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=stderr)
+        timer = None
+        if deadline is not None:
+            timer = threading.Timer(_remaining(deadline), process.kill)
+            timer.start()
+        try:
+            yield process.stdout
+        finally:
+            if timer is not None:
+                timer.cancel()
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            returncode = process.wait()
+        
+        if deadline is not None and time.monotonic() >= deadline and returncode < 0:
+            raise subprocess.TimeoutExpired(command, _remaining(deadline))
+        if returncode:
+            stderr.seek(0)
+            raise subprocess.CalledProcessError(returncode, command, stderr=stderr.read())
+
+
+def _failed_contribution(repo_name: str, full_name: Optional[str], error: str, include_months: bool = False) -> Dict:
+    return {**_empty_contribution(repo_name, full_name, include_months), 'error': error}
+
+
+def _empty_contribution(repo_name: str, full_name: Optional[str], include_months: bool = False) -> Dict:
+    contribution = {
+        'repository': repo_name,
+        'full_name': full_name or repo_name,
+        **_empty_bucket(),
+        'years': {},
+        'weekly': empty_series()
+    }
+    if include_months:
+        contribution['months'] = {}
+    return contribution
+
+
+def _empty_bucket() -> Dict:
+    return {'added_lines': 0, 'deleted_lines': 0, 'total_lines': 0}
+
+
+def period_contribution(contribution: Dict, year: Optional[int] = None) -> Dict:
+    """Flatten a multi-period result into a single-row dict for one year (or all time)."""
+    row = {'repository': contribution['repository']}
+    if year is None:
+        bucket = contribution
+    else:
+        bucket = contribution.get('years', {}).get(year, _empty_bucket())
+    row.update({key: bucket[key] for key in ('added_lines', 'deleted_lines', 'total_lines')})
+    if 'error' in contribution:
+        row['error'] = contribution['error']
+    return row
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'git-contributions', 'http_cache.sqlite3')
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+class ResponseCache:
+    """Persistent store of GitHub API responses for conditional requests.
+
+    Each entry is keyed by the request URL, its query parameters and a hash of
+    the credentials used, so one token never sees another token's responses.
+    Stored ``ETag``/``Last-Modified`` validators are replayed as
+    ``If-None-Match``/``If-Modified-Since`` and a ``304 Not Modified`` is
+    answered from the stored body. GitHub does not count 304s against the
+    rate limit.
+
+    Entries older than ``ttl`` seconds are dropped, and once the stored bodies
+    exceed ``max_bytes`` the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path or os.environ.get('HTTP_CACHE_PATH') or DEFAULT_CACHE_PATH
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                stored_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def key_for(url: str, params: Optional[Dict] = None, authorization: str = '') -> str:
+        scope = hashlib.sha256(authorization.encode()).hexdigest()[:16]
+        query = json.dumps(params or {}, sort_keys=True, default=str)
+        return f"{scope} {url} {query}"
+
+    def validators(self, key: str) -> Dict[str, str]:
+        """Conditional request headers for ``key``, or an empty dict on a miss."""
+        entry = self._get(key)
+        if entry is None:
+            return {}
+        etag, last_modified = entry[0], entry[1]
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        """Return the stored ``{'headers', 'body'}`` for ``key`` after a 304 and count a hit.
+
+        The 304 confirmed the entry is current, so its TTL starts over.
+        """
+        entry = self._get(key)
+        if entry is None:
+            return None
+        with self._lock:
+            self.hits += 1
+            now = time.time()
+            self._conn.execute("UPDATE responses SET stored_at = ?, used_at = ? WHERE key = ?", (now, now, key))
+            self._conn.commit()
+        return {'headers': json.loads(entry[2]), 'body': entry[3]}
+
+    def store(self, key: str, headers: Dict[str, str], body: bytes):
+        """Save a fresh 200 response, if it carries a validator, and count a miss."""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        with self._lock:
+            self.misses += 1
+            if not etag and not last_modified:
+                return
+            now = time.time()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, etag, last_modified, json.dumps(dict(headers)), body, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()
+            return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def _get(self, key: str):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT etag, last_modified, headers, body FROM responses WHERE key = ? AND stored_at >= ?",
+                (key, time.time() - self.ttl)
+            ).fetchone()
+
+    def _evict(self):
+        self._conn.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - self.ttl,))
+        self._conn.execute("""
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(LENGTH(body)) OVER (ORDER BY used_at DESC) AS running
+                    FROM responses
+                ) WHERE running > ?
+            )
+        """, (self.max_bytes,))
@@ -0,0 +1,262 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from typing import Dict, List, Optional
+
+DEFAULT_JOBS_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'git-contributions', 'jobs.sqlite3')
+POLL_INTERVAL = 1.0
+# A running job whose worker has not reported for this long is handed to another worker
+STALE_AFTER = 10 * 60.0
+HEARTBEAT_INTERVAL = 30.0
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobStore:
+    """SQLite-backed queue of analysis jobs, shared by the UI and worker processes.
+
+    Jobs move from ``queued`` to ``running`` when a worker claims them and
+    end as ``done`` (with a JSON ``result``) or ``failed`` (with ``error``).
+    Workers report ``progress`` (0..1) and a short ``message`` as they go,
+    which the UI polls by job id.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get('JOBS_DB_PATH') or DEFAULT_JOBS_PATH
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    owner TEXT,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    result TEXT,
+                    error TEXT,
+                    worker TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_owner_created ON jobs (owner, created_at)")
+
+    def submit(self, kind: str, payload: Dict, owner: Optional[str] = None, reuse_active: bool = False) -> str:
+        """Queue a job and return its id.
+
+        With ``reuse_active``, an ``owner``'s job of the same kind that is
+        still queued or running is returned instead of queuing another.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            if reuse_active and owner is not None:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE owner = ? AND kind = ? AND status IN (?, ?) ORDER BY created_at DESC LIMIT 1",
+                    (owner, kind, QUEUED, RUNNING)
+                ).fetchone()
+                if row is not None:
+                    return row['id']
+            conn.execute(
+                "INSERT INTO jobs (id, kind, owner, payload, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, owner, json.dumps(payload), QUEUED, now, now)
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Job status for the UI; the payload (which holds credentials) is left out."""
+        return self._find("id = ?", (job_id,))
+
+    def latest(self, owner: str) -> Optional[Dict]:
+        """Most recent job submitted by ``owner``, so a reloaded page can find it again."""
+        return self._find("owner = ? ORDER BY created_at DESC LIMIT 1", (owner,))
+
+    def claim(self, worker: str) -> Optional[Dict]:
+        """Atomically take the oldest queued job, returning it with its payload."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, kind, payload FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, worker, time.time(), row['id'])
+            )
+        return {'id': row['id'], 'kind': row['kind'], 'payload': json.loads(row['payload'])}
+
+    def report(self, job_id: str, progress: float, message: Optional[str] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = ?, message = ?, updated_at = ? WHERE id = ?",
+                (progress, message, time.time(), job_id)
+            )
+
+    def heartbeat(self, job_id: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING))
+
+    def complete(self, job_id: str, result: Dict):
+        self._finish(job_id, DONE, result=json.dumps(result))
+
+    def fail(self, job_id: str, error: str):
+        self._finish(job_id, FAILED, error=error)
+
+    def requeue_stale(self, max_age: float = STALE_AFTER) -> int:
+        """Put running jobs back in the queue if their worker went silent."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (QUEUED, time.time(), RUNNING, time.time() - max_age)
+            )
+            return cursor.rowcount
+
+    def _find(self, condition: str, params: tuple) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, owner, status, progress, message, result, error, created_at, updated_at "
+                f"FROM jobs WHERE {condition}",
+                params
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def _finish(self, job_id: str, status: str, result: Optional[str] = None, error: Optional[str] = None):
+        with self._connect() as conn:
+            # The payload carries the user's token; drop it once the job no longer needs it
+            conn.execute(
+                "UPDATE jobs SET status = ?, progress = 1, result = ?, error = ?, payload = '{}', updated_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id)
+            )
+
+    def _connect(self) -> '_Transaction':
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return _Transaction(conn)
+
+
+class _Transaction:
+    """Connection wrapper that commits (or rolls back) and closes on exit."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.conn.close()
+
+
+def run_job(store: JobStore, job: Dict):
+    """Execute one claimed job and record its outcome."""
+    from analysis import run_user_analysis
+    from repo_cache import RepoCache
+    from scheduler import format_eta
+
+    job_id = job['id']
+    payload = job['payload']
+    # Keep the job visibly alive while a single large repository takes a long time
+    stop_heartbeat = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(store, job_id, stop_heartbeat), daemon=True)
+    heartbeat.start()
+    try:
+        if job['kind'] != 'analyze_user':
+            raise ValueError(f"Unknown job kind: {job['kind']}")
+
+        def on_progress(completed: int, total: int, contribution: Dict, eta: float):
+            remaining = f", {format_eta(eta)} left" if completed < total else ""
+            store.report(job_id, completed / total, f"Completed {contribution['repository']} ({completed}/{total}{remaining})")
+
+        store.report(job_id, 0.0, "Listing repositories")
+        repo_cache = RepoCache(root=payload.get('repo_cache_dir'), max_bytes=payload.get('repo_cache_max_bytes'))
+        result = run_user_analysis(
+            payload['token'],
+            payload['username'],
+            payload['author_emails'],
+            avatar_url=payload.get('avatar_url'),
+            repo_cache=repo_cache,
+            max_workers=payload.get('max_workers'),
+            timeout=payload.get('timeout'),
+            progress_callback=on_progress,
+            max_size_kb=_kb(payload.get('max_repo_size_mb')),
+            degraded_size_kb=_kb(payload.get('degraded_repo_size_mb'))
+        )
+        store.complete(job_id, result)
+    except Exception as e:
+        traceback.print_exc()
+        store.fail(job_id, str(e))
+    finally:
+        stop_heartbeat.set()
+
+
+def _kb(size_mb) -> Optional[int]:
+    return int(float(size_mb) * 1024) if size_mb else None
+
+
+def _heartbeat(store: JobStore, job_id: str, stop: threading.Event):
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        store.heartbeat(job_id)
+
+
+def worker_loop(path: Optional[str] = None, poll_interval: float = POLL_INTERVAL):
+    """Claim and run jobs forever; meant to be the body of a worker process."""
+    store = JobStore(path)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        job = store.claim(worker)
+        if job is None:
+            store.requeue_stale()
+            time.sleep(poll_interval)
+            continue
+        run_job(store, job)
+
+
+def start_workers(count: int, path: Optional[str] = None) -> List[multiprocessing.Process]:
+    """Start ``count`` daemon worker processes that drain the queue at ``path``."""
+    # Spawn rather than fork: the parent may be a multi-threaded Streamlit server
+    context = multiprocessing.get_context('spawn')
+    processes = []
+    for _ in range(count):
+        process = context.Process(target=worker_loop, args=(path,), daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background analysis workers")
+    parser.add_argument('--workers', type=int, default=1, help="number of worker processes")
+    parser.add_argument('--jobs-db', default=None, help="path of the SQLite job queue")
+    args = parser.parse_args()
+
+    processes = start_workers(args.workers, args.jobs_db)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
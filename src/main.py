@@ -1,12 +1,61 @@
 import streamlit as st
 import pandas as pd
-from github_client import GitHubClient
-from visualization import create_metrics_display, create_contribution_charts, create_social_share_image
+from visualization import create_metrics_display, cached_contribution_bar
 from auth import init_github_oauth, handle_oauth_callback, logout
 import urllib.parse
 import os
 import hashlib
-from database import Database
+import json
+from datetime import datetime, timezone
+from database import cached_leaderboard, cached_search_users, cached_user_rank, get_database, invalidate_read_caches
+from jobs import FAILED, QUEUED, RUNNING, JobStore, start_workers
+from share_images import ShareImageCache
+
+# How often a page showing an unfinished job re-reads its status
+JOB_POLL_SECONDS = 2
+# Repositories larger than this (GitHub's size, in MB) only get their default branch analyzed
+DEFAULT_DEGRADED_REPO_MB = 2048
+# How often a page whose share image is still rendering checks on it
+SHARE_IMAGE_POLL_SECONDS = 1
+
+def leaderboard_periods() -> list:
+    """Sidebar leaderboard tabs: (label, period) for all time, the last two years and rolling windows."""
+    year = datetime.now(timezone.utc).year
+    return [
+        ("All Time", "all_time"),
+        (str(year), f"year_{year}"),
+        (str(year - 1), f"year_{year - 1}"),
+        ("Last 90 Days", "last_90_days"),
+        ("12 Months", "rolling_12_months")
+    ]
+
+def get_repo_cache_settings() -> dict:
+    """Mirror cache location and size budget handed to analysis workers."""
+    max_gb = st.secrets.get('REPO_CACHE_MAX_GB')
+    return {
+        'repo_cache_dir': st.secrets.get('REPO_CACHE_DIR'),
+        'repo_cache_max_bytes': int(float(max_gb) * 1024 ** 3) if max_gb else None
+    }
+
+@st.cache_resource
+def get_job_store() -> JobStore:
+    """Open the job queue once per server and start its local worker processes."""
+    store = JobStore(st.secrets.get('JOBS_DB_PATH'))
+    # Set ANALYSIS_JOB_WORKERS = 0 when workers run elsewhere (python src/jobs.py)
+    start_workers(int(st.secrets.get('ANALYSIS_JOB_WORKERS', 2)), store.path)
+    return store
+
+@st.cache_resource
+def get_share_images() -> ShareImageCache:
+    """Share image cache and its render pool, one per server."""
+    max_mb = st.secrets.get('SHARE_IMAGE_MAX_MB')
+    max_age_days = st.secrets.get('SHARE_IMAGE_MAX_AGE_DAYS')
+    return ShareImageCache(
+        root=st.secrets.get('SHARE_IMAGE_DIR'),
+        max_bytes=int(float(max_mb) * 1024 ** 2) if max_mb else None,
+        max_age=float(max_age_days) * 24 * 3600 if max_age_days else None,
+        max_workers=int(st.secrets.get('SHARE_IMAGE_WORKERS', 1))
+    )
 
 def main():
     st.set_page_config(
@@ -15,9 +64,6 @@ def main():
         layout="wide"
     )
 
-    # Initialize the database connection
-    db = Database()
-
     st.title("🐙 GitHub Line Contribution Analyzer")
     st.markdown("""
     git log analysis of your contributions across all repositories.
@@ -38,6 +84,12 @@ def main():
                 
                 *Using {len(user['emails'])} verified email(s)*
                 """)
+                user_rank = cached_user_rank(user['login'])
+                if user_rank:
+                    st.markdown(
+                        f"🏅 Rank **#{user_rank['rank']:,}** of {user_rank['total']:,} "
+                        f"(ahead of {user_rank['percentile']:.0f}% of contributors)"
+                    )
                 if st.button("🚪 Logout", type="primary"):
                     logout()
 
@@ -46,34 +98,33 @@ def main():
         st.markdown("### 🔍 Search Contributor")
         search_query = st.text_input("Search by username", placeholder="Enter GitHub username")
         if search_query:
-            search_results = db.search_users(search_query)
+            search_results = cached_search_users(search_query)
             if search_results:
                 for user_stats in search_results:
                     st.markdown(
                         f"**{user_stats['username']}**  \n"
                         f"Net Lines: {user_stats['all_time']['total_net']:,}"
                     )
+            else:
+                # No exact match; offer usernames that start with what was typed
+                suggestions = get_database().suggest_usernames(search_query)
+                if suggestions:
+                    st.markdown("Did you mean: " + ", ".join(f"**{name}**" for name in suggestions))
 
     # Display leaderboard in the sidebar
     with st.sidebar:
         st.markdown("### 🏆 Top Contributors")
-        tab1, tab2 = st.tabs(["All Time", "2024"])
-        
-        with tab1:
-            leaderboard_all = db.get_leaderboard(period='all_time')
-            for rank, user_stats in enumerate(leaderboard_all, 1):
-                st.markdown(
-                    f"{rank}. **{user_stats['username']}**  \n"
-                    f"Net Lines: {user_stats['all_time']['total_net']:,}"
-                )
-        
-        with tab2:
-            leaderboard_2024 = db.get_leaderboard(period='year_2024')
-            for rank, user_stats in enumerate(leaderboard_2024, 1):
-                st.markdown(
-                    f"{rank}. **{user_stats['username']}**  \n"
-                    f"Net Lines: {user_stats['year_2024']['total_net']:,}"
-                )
+        periods = leaderboard_periods()
+        for tab, (_, period) in zip(st.tabs([label for label, _ in periods]), periods):
+            with tab:
+                leaderboard = cached_leaderboard(period=period)
+                if not leaderboard:
+                    st.caption("No contributors yet for this period.")
+                for rank, user_stats in enumerate(leaderboard, 1):
+                    st.markdown(
+                        f"{rank}. **{user_stats['username']}**  \n"
+                        f"Net Lines: {user_stats[period]['total_net']:,}"
+                    )
 
     # Only show the rest of the UI if authenticated
     if token:
@@ -93,138 +144,134 @@ def main():
         if st.button("Analyze Contributions"):
             if username and emails:
                 author_emails = [email.strip() for email in emails.split(',')]
-                with st.spinner('Fetching GitHub contributions...'):
-                    client = GitHubClient(token['access_token'])  # Use the OAuth token
-                    
-                    try:
-                        # Fetch repositories
-                        repos = client.get_user_repos(username)
-                        
-                        if not repos:
-                            st.warning("No repositories found for this user.")
-                            return
-                        
-                        # Progress tracking setup
-                        st.write("## Analysis Progress")
-                        progress_placeholder = st.empty()
-                        log_placeholder = st.empty()
-                        
-                        # Create a container for progress information
-                        with st.container():
-                            progress_bar = st.progress(0.0)
-                            status_text = st.empty()
-                        
-                        # Analyze each repository
-                        total_repos = len([repo for repo in repos if not repo['fork']])
-                        processed_repos = 0
-                        contributions_all_time = []
-                        contributions_2024 = []
-                        
-                        for repo in repos:
-                            if not repo['fork']:
-                                # Update progress
-                                current_progress = float(processed_repos) / float(total_repos)
-                                progress_bar.progress(current_progress)
-                                
-                                # Update status
-                                progress_placeholder.markdown(
-                                    f"**Processing: {processed_repos+1}/{total_repos} repositories ({int(current_progress * 100)}%)**"
-                                )
-                                
-                                # Add log message
-                                log_placeholder.markdown(f"{repo['name']}...")
-                                
-                                # Process repository for all time
-                                contribution_all = client.analyze_repo_contributions(
-                                    username,
-                                    repo['name'],
-                                    repo['clone_url'],
-                                    author_emails,
-                                    year=None
-                                )
-                                if contribution_all['added_lines'] > 0 or contribution_all['deleted_lines'] > 0:
-                                    contributions_all_time.append(contribution_all)
-                                
-                                # Process repository for 2024
-                                contribution_2024 = client.analyze_repo_contributions(
-                                    username,
-                                    repo['name'],
-                                    repo['clone_url'],
-                                    author_emails,
-                                    year=2024
-                                )
-                                if contribution_2024['added_lines'] > 0 or contribution_2024['deleted_lines'] > 0:
-                                    contributions_2024.append(contribution_2024)
-                                
-                                # Update log with completion
-                                log_placeholder.markdown(f"✅ Completed {repo['name']}")
-                                processed_repos += 1
-                                # Clear log for next repository
-                                log_placeholder.empty()
-                        
-                        # Complete the progress bar
-                        progress_bar.progress(1.0)
-                        progress_placeholder.markdown("**✨ Analysis Complete!**")
-                        
-                        # Add spacing after progress section
-                        st.write("---")
-                        
-                        if contributions_all_time or contributions_2024:
-                            # Create DataFrames
-                            df_all_time = pd.DataFrame(contributions_all_time) if contributions_all_time else pd.DataFrame()
-                            df_2024 = pd.DataFrame(contributions_2024) if contributions_2024 else pd.DataFrame()
-                            
-                            # Store stats in database
-                            db = Database()
-                            stats_all_time = {
-                                "total_added": int(df_all_time['added_lines'].sum()) if not df_all_time.empty else 0,
-                                "total_deleted": int(df_all_time['deleted_lines'].sum()) if not df_all_time.empty else 0,
-                                "total_net": int(df_all_time['total_lines'].sum()) if not df_all_time.empty else 0
-                            }
-                            stats_2024 = {
-                                "total_added": int(df_2024['added_lines'].sum()) if not df_2024.empty else 0,
-                                "total_deleted": int(df_2024['deleted_lines'].sum()) if not df_2024.empty else 0,
-                                "total_net": int(df_2024['total_lines'].sum()) if not df_2024.empty else 0
-                            }
-                            
-                            # Store user stats
-                            avatar_url = user.get('avatar_url') if user else None
-                            db.store_user_stats(username, stats_all_time, stats_2024, avatar_url)
-                            
-                            # Visualization Tabs
-                            tab1, tab2 = st.tabs(["From Beginning", "2024"])
-                            
-                            # Create charts (but don't display yet)
-                            fig_bar_all_time, fig_line_all_time = create_contribution_charts(df_all_time)
-                            fig_bar_2024, fig_line_2024 = create_contribution_charts(df_2024)
-                            
-                            with tab1:
-                                st.subheader("📊 Contributions from Beginning")
-                                # Display metrics first
-                                create_metrics_display(df_all_time)
-                                # Then display chart
-                                st.plotly_chart(fig_bar_all_time, use_container_width=True)
-                            
-                            with tab2:
-                                st.subheader("📊 Contributions in 2024")
-                                # Display metrics first
-                                create_metrics_display(df_2024)
-                                # Then display chart
-                                st.plotly_chart(fig_bar_2024, use_container_width=True)
-                            
-                            # Detailed Repository Table
-                            st.dataframe(
-                                df_all_time.sort_values('total_lines', ascending=False),
-                                use_container_width=True
-                            )
-                            
-                            # Add share functionality
-                            create_share_section(df_all_time, username)
-                        else:
-                            st.warning("No contributions found in the analyzed repositories.")
-                        
-                    except Exception as e:
-                        st.error(f"Error analyzing contributions: {str(e)}")
+                # Hand the analysis to a background worker so a rerun or refresh
+                # doesn't throw away the cloning work
+                job_id = get_job_store().submit('analyze_user', {
+                    'token': token['access_token'],
+                    'username': username,
+                    'author_emails': author_emails,
+                    'avatar_url': user.get('avatar_url') if user else None,
+                    'max_workers': st.secrets.get('ANALYSIS_MAX_WORKERS'),
+                    'timeout': st.secrets.get('ANALYSIS_REPO_TIMEOUT'),
+                    'max_repo_size_mb': st.secrets.get('ANALYSIS_MAX_REPO_MB'),
+                    'degraded_repo_size_mb': st.secrets.get('ANALYSIS_DEGRADED_REPO_MB', DEFAULT_DEGRADED_REPO_MB),
+                    **get_repo_cache_settings()
+                }, owner=username, reuse_active=True)
+                st.session_state.analysis_job = job_id
+                st.query_params['job'] = job_id
+        
+        # Follow the current job, or pick up the latest one after a page reload
+        job_id = st.session_state.get('analysis_job') or st.query_params.get('job')
+        job = get_job_store().get(job_id) if job_id else get_job_store().latest(username)
+        if job and job['owner'] == username:
+            display_job(job, username)
+
+def display_job(job: dict, username: str):
+    if job['status'] in (QUEUED, RUNNING):
+        job_progress(job['id'])
+        return
+    
+    if job['status'] == FAILED:
+        st.error(f"Error analyzing contributions: {job['error']}")
+        return
+    
+    # The worker wrote new stats from another process; refresh the sidebar once
+    if st.session_state.get('invalidated_job') != job['id']:
+        st.session_state.invalidated_job = job['id']
+        invalidate_read_caches()
+    
+    result = job['result']
+    if result['repo_count'] == 0:
+        st.warning("No repositories found for this user.")
+        return
+    
+    st.write("## Analysis Progress")
+    st.progress(1.0)
+    st.markdown("**✨ Analysis Complete!**")
+    for failure in result['errors']:
+        st.markdown(f"⚠️ {failure['repository']}: {failure['error']}")
+    for repository in result.get('degraded', []):
+        st.markdown(f"ℹ️ {repository}: too large to analyze fully, only the default branch was counted")
+    
+    # Add spacing after progress section
+    st.write("---")
+    
+    contributions_all_time = result['all_time']
+    # Jobs finished before per-year results only kept 2024
+    contributions_by_year = result.get('years') or ({'2024': result['year_2024']} if result.get('year_2024') else {})
+    if contributions_all_time:
+        # Create DataFrames
+        df_all_time = pd.DataFrame(contributions_all_time)
+        
+        # Visualization Tabs
+        tab1, tab2 = st.tabs(["From Beginning", "By Year"])
+        
+        with tab1:
+            st.subheader("📊 Contributions from Beginning")
+            # Display metrics first
+            create_metrics_display(df_all_time)
+            # Then display chart (built once per result, then served from cache)
+            st.plotly_chart(cached_contribution_bar(df_all_time), use_container_width=True)
+        
+        with tab2:
+            # Job results went through JSON, so the years are strings
+            years = sorted(contributions_by_year, key=int, reverse=True)
+            if years:
+                year = st.selectbox("Year", years, key=f"year_{job['id']}")
+                df_year = pd.DataFrame(contributions_by_year[year])
+                st.subheader(f"📊 Contributions in {year}")
+                # Display metrics first
+                create_metrics_display(df_year)
+                # Then display chart
+                st.plotly_chart(cached_contribution_bar(df_year), use_container_width=True)
+            else:
+                st.info("No dated contributions found.")
+        
+        # Detailed Repository Table
+        st.dataframe(
+            df_all_time.sort_values('total_lines', ascending=False),
+            use_container_width=True
+        )
+        
+        # Add share functionality
+        create_share_section(df_all_time, username)
+    else:
+        st.warning("No contributions found in the analyzed repositories.")
+    
+    if result.get('telemetry') and (st.secrets.get('DEVELOPER_PANEL') or st.query_params.get('debug')):
+        create_developer_panel(result['telemetry'])
+
+def create_developer_panel(trace: dict):
+    """Where the analysis spent its time: per-stage totals, counters and the slowest repositories."""
+    with st.expander("🛠️ Developer: timings", expanded=False):
+        st.markdown(f"**Total:** {trace['seconds']:.2f}s")
+        stages = pd.DataFrame([
+            {'stage': stage, **totals} for stage, totals in trace['stages'].items()
+        ])
+        if not stages.empty:
+            st.dataframe(stages.sort_values('seconds', ascending=False), use_container_width=True)
+        if trace['counters']:
+            st.json(trace['counters'])
+        repos = pd.DataFrame([span for span in trace['spans'] if span['stage'] == 'repo'])
+        if not repos.empty:
+            st.markdown("**Slowest repositories**")
+            st.dataframe(repos.sort_values('seconds', ascending=False).head(20), use_container_width=True)
+        st.download_button("Download trace (JSON)", json.dumps(trace), file_name="analysis-trace.json")
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(job_id: str):
+    """Progress of an unfinished job, polled without rerunning the page; the page reruns once the job ends."""
+    job = get_job_store().get(job_id)
+    if job is None or job['status'] not in (QUEUED, RUNNING):
+        st.rerun()
+    st.write("## Analysis Progress")
+    st.progress(float(job['progress']))
+    if job['status'] == QUEUED:
+        st.markdown("**Waiting for a worker...**")
+    else:
+        st.markdown(f"**Processing: {int(job['progress'] * 100)}%**")
+    if job['message']:
+        st.markdown(job['message'])
 
 def create_share_section(df: pd.DataFrame, username: str):
     # Calculate stats
@@ -258,6 +305,36 @@ def create_share_section(df: pd.DataFrame, username: str):
         </a>
     </div>
     """, unsafe_allow_html=True)
+    
+    # Share card, rendered in the background once per result and then served from disk
+    card = (username, int(total_added), int(total_deleted), verification_hash)
+    image_path = get_share_images().get(*card)
+    if image_path:
+        with open(image_path, 'rb') as f:
+            image = f.read()
+        st.image(image)
+        st.download_button("⬇️ Download share image", image, file_name=f"{username}-contributions.png", mime="image/png")
+    elif st.session_state.get('share_image_failed') != card:
+        share_image_placeholder(card)
+
+@st.fragment(run_every=SHARE_IMAGE_POLL_SECONDS)
+def share_image_placeholder(card: tuple):
+    """Stand-in while a share image renders; reruns the page once it is on disk, without blocking on it."""
+    renders = st.session_state.setdefault('share_image_renders', {})
+    if card not in renders:
+        renders[card] = get_share_images().request(*card)
+    future = renders[card]
+    if not future.done():
+        st.caption("🖼️ Preparing your share image...")
+        return
+    del renders[card]
+    try:
+        future.result()
+    except Exception as e:
+        print(f"Error rendering share image: {e}")
+        # Don't keep retrying a render that fails on this page
+        st.session_state.share_image_failed = card
+    st.rerun()
 
 def verify_contribution_hash(username: str, added: int, deleted: int, repos: str, hash_to_verify: str) -> bool:
     """Verify a contribution hash from a tweet."""
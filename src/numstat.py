@@ -0,0 +1,324 @@
+import codecs
+import csv
+import io
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import telemetry
+from timeseries import EPOCH_MONDAY, SECONDS_PER_WEEK, empty_series
+
+# Each commit's header line is shaped like a numstat line whose first column is
+# -1, which numstat never prints, so the whole log reads as one numeric table:
+# -1, commit time, then sha, author name and email separated by \x1f
+HEADER = '-1'
+LOG_FORMAT = f'{HEADER}%x09%ct%x09%H%x1f%an%x1f%ae'
+# Bytes of log parsed per chunk; memory use is bounded by this, not by the log size
+CHUNK_BYTES = 8 * 1024 * 1024
+# Entries kept in each breakdown (extensions, directories, files)
+DEFAULT_TOP_N = 20
+# Per-file rows buffered by FileStats before they are folded into per-path totals
+COMPACT_ROWS = 500_000
+
+COMMIT_COLUMNS = ['sha', 'timestamp', 'author_name', 'author_email', 'added', 'deleted', 'binary_files', 'renamed_files']
+
+
+def read_chunks(stream: BinaryIO, chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """Read ``git log`` output in blocks of roughly ``chunk_bytes``, each ending on a commit boundary."""
+    boundary = f'\n{HEADER}\t'.encode()
+    pending = b''
+    while True:
+        block = stream.read(chunk_bytes)
+        if not block:
+            break
+        pending += block
+        cut = pending.rfind(boundary)
+        if cut > 0 and len(pending) >= chunk_bytes:
+            yield pending[:cut + 1]
+            pending = pending[cut + 1:]
+    if pending:
+        yield pending
+
+
+def parse_log(stream: BinaryIO,
+              files: Optional['FileStats'] = None,
+              details: bool = False,
+              chunk_bytes: int = CHUNK_BYTES) -> Iterator[pd.DataFrame]:
+    """Parse ``git log --numstat`` (in ``LOG_FORMAT``) into one commits frame per chunk, as it streams in.
+
+    Frames have ``timestamp`` (commit time, epoch seconds), ``added``,
+    ``deleted`` and ``binary_files`` (numstat ``-\t-``, no line counts).
+    With ``details`` they also have ``sha``, ``author_name``, ``author_email``
+    and ``renamed_files`` (``old => new`` paths), i.e. all ``COMMIT_COLUMNS``.
+    Per-file rows are handed to ``files`` when given. Without either, paths
+    and authors are never decoded, which is most of the parsing cost.
+    """
+    details = details or files is not None
+    walked = 0
+    read = 0
+    for chunk in read_chunks(stream, chunk_bytes):
+        read += len(chunk)
+        commits, changes = parse_chunk(chunk, details)
+        walked += len(commits)
+        if files is not None:
+            files.add(changes)
+        yield commits
+    telemetry.count('commits_walked', walked)
+    telemetry.count('log_bytes', read)
+
+
+def parse_chunk(chunk: bytes, details: bool = False) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """Commits of a chunk starting at a commit header and, with ``details``, its per-file changes.
+
+    Changes are ``path``, ``added`` and ``deleted`` per numstat line with
+    line counts, the path taken after any rename and unquoted.
+    """
+    rows = _read_rows(chunk, details)
+    first = rows['c0'].to_numpy(dtype=float)
+    second = rows['c1'].to_numpy(dtype=float)
+    is_header = first == -1
+    # Every row belongs to the last header above it
+    owners = np.cumsum(is_header) - 1
+    stats = ~is_header & (owners >= 0)
+    counted = stats & ~np.isnan(first) & ~np.isnan(second)
+    binary = stats & ~counted
+
+    count = int(is_header.sum())
+    commits = pd.DataFrame({
+        'timestamp': second[is_header].astype(np.int64),
+        'added': np.bincount(owners[counted], weights=first[counted], minlength=count).astype(np.int64),
+        'deleted': np.bincount(owners[counted], weights=second[counted], minlength=count).astype(np.int64),
+        'binary_files': np.bincount(owners[binary], minlength=count).astype(np.int64)
+    })
+    if not details:
+        return commits, None
+
+    third = rows['c2']
+    # One short split per commit; cheaper than pandas' string splitting into columns
+    fields = [(header.split('\x1f', 2) + ['', ''])[:3] for header in third[is_header].tolist()]
+    shas, names, emails = zip(*fields) if fields else ((), (), ())
+    commits['sha'] = np.array(shas, dtype=object)
+    commits['author_name'] = np.array(names, dtype=object)
+    commits['author_email'] = np.array(emails, dtype=object)
+    paths = third[counted]
+    renamed = paths.str.contains(' => ', regex=False).to_numpy(dtype=bool)
+    commits['renamed_files'] = np.bincount(owners[counted][renamed], minlength=count).astype(np.int64)
+
+    changes = pd.DataFrame({
+        'path': _unquote_paths(_resolve_renames(paths.reset_index(drop=True))),
+        'added': first[counted].astype(np.int64),
+        'deleted': second[counted].astype(np.int64)
+    })
+    return commits[COMMIT_COLUMNS], changes
+
+
+def _read_rows(chunk: bytes, details: bool) -> pd.DataFrame:
+    """Split a chunk into its tab-separated columns with pandas' C parser.
+
+    ``c0`` and ``c1`` are numbers (NaN for binary files' ``-``); ``c2``, the
+    path or the rest of a commit header, is only decoded with ``details``.
+    """
+    lines = chunk.count(b'\n') + (not chunk.endswith(b'\n')) - chunk.count(b'\n\n') - chunk.startswith(b'\n')
+    if chunk.count(b'\t') == 2 * lines:
+        return pd.read_csv(
+            io.BytesIO(chunk),
+            sep='\t',
+            header=None,
+            names=['c0', 'c1', 'c2'],
+            usecols=['c0', 'c1', 'c2'] if details else ['c0', 'c1'],
+            dtype={'c0': np.float64, 'c1': np.float64, 'c2': str},
+            quoting=csv.QUOTE_NONE,
+            # Binary files' counts only; a file may well be named -
+            na_values={'c0': ['-'], 'c1': ['-']},
+            keep_default_na=False,
+            encoding_errors='replace',
+            engine='c'
+        )
+    # A tab in an author name (the C parser would drop what follows it) or
+    # some other odd line; split by hand, treating anything non-numeric as missing
+    lines = chunk.decode('utf-8', errors='replace').splitlines()
+    split = [(line.split('\t', 2) + ['', ''])[:3] for line in lines if line]
+    rows = pd.DataFrame(split, columns=['c0', 'c1', 'c2'], dtype=str)
+    rows['c0'] = pd.to_numeric(rows['c0'], errors='coerce')
+    rows['c1'] = pd.to_numeric(rows['c1'], errors='coerce')
+    return rows
+
+
+def _resolve_renames(paths: pd.Series) -> pd.Series:
+    """Paths after the change: ``src/{old => new}/a.py`` becomes ``src/new/a.py``, ``a => b`` becomes ``b``."""
+    renamed = paths.str.contains(' => ', regex=False)
+    if not renamed.any():
+        return paths
+    resolved = paths[renamed].str.replace(r'\{[^{}]* => ([^{}]*)\}', r'\1', regex=True)
+    resolved = resolved.str.replace(r'^.* => ', '', regex=True).str.replace('//', '/', regex=False)
+    paths = paths.copy()
+    paths[renamed] = resolved
+    return paths
+
+
+def _unquote_paths(paths: pd.Series) -> pd.Series:
+    """Undo git's C-style quoting of paths with special characters: ``"src/t\\"q.py"`` becomes ``src/t"q.py``.
+
+    Run git with ``-c core.quotePath=false`` so that non-ASCII paths come
+    through as they are; quotes, backslashes and control characters are
+    quoted regardless (as are non-ASCII paths otherwise, as octal bytes).
+    """
+    quoted = paths.str.startswith('"') & paths.str.endswith('"') & (paths.str.len() > 1)
+    if not quoted.any():
+        return paths
+    paths = paths.copy()
+    paths[quoted] = paths[quoted].map(_unquote)
+    return paths
+
+
+def _unquote(path: str) -> str:
+    # Escapes are \\, \", \t, \n, ... and \ooo octal bytes of the UTF-8 path
+    return codecs.escape_decode(path[1:-1].encode('utf-8'))[0].decode('utf-8', errors='replace')
+
+
+def aggregate(frames: Iterable[pd.DataFrame], include_months: bool = False) -> Dict:
+    """Sum commits frames into all-time, yearly, weekly and (optionally) monthly buckets.
+
+    Each frame is reduced to per-week, per-year and per-month sums as it
+    arrives, so only those (small) partial sums are kept.
+    """
+    weekly = []
+    yearly = []
+    monthly = []
+    for commits in frames:
+        if commits.empty:
+            continue
+        timestamps = commits['timestamp'].to_numpy(dtype=np.int64)
+        counts = commits[['added', 'deleted']]
+        weekly.append(counts.groupby((timestamps - int(EPOCH_MONDAY.timestamp())) // SECONDS_PER_WEEK).sum())
+        moments = timestamps.astype('datetime64[s]')
+        yearly.append(counts.groupby(moments.astype('datetime64[Y]').astype(np.int64) + 1970).sum())
+        if include_months:
+            monthly.append(counts.groupby(np.datetime_as_string(moments.astype('datetime64[M]'), unit='M')).sum())
+
+    years = _buckets(yearly)
+    aggregated = {
+        **_bucket(sum(bucket['added_lines'] for bucket in years.values()),
+                  sum(bucket['deleted_lines'] for bucket in years.values())),
+        'years': years,
+        'weekly': _series(weekly)
+    }
+    if include_months:
+        aggregated['months'] = _buckets(monthly)
+    return aggregated
+
+
+def commit_records(frames: Iterable[pd.DataFrame]) -> List[Dict]:
+    """Detailed commits frames as one plain dict per commit (as stored by the contribution index)."""
+    records = []
+    for commits in frames:
+        columns = [commits[column].tolist() for column in COMMIT_COLUMNS]
+        records.extend(dict(zip(COMMIT_COLUMNS, row)) for row in zip(*columns))
+    return records
+
+
+def collect_records(frames: Iterable[pd.DataFrame], records: List[Dict]) -> Iterator[pd.DataFrame]:
+    """Pass detailed commits frames through, adding their ``commit_records`` to ``records`` on the way.
+
+    Lets one pass over a streamed log both aggregate it and keep its
+    commits without holding on to the frames.
+    """
+    for commits in frames:
+        records.extend(commit_records([commits]))
+        yield commits
+
+
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _bucket(added: int, deleted: int) -> Dict:
+    return {'added_lines': int(added), 'deleted_lines': int(deleted), 'total_lines': int(added - deleted)}
+
+
+def _buckets(partials: List[pd.DataFrame]) -> Dict:
+    if not partials:
+        return {}
+    totals = pd.concat(partials).groupby(level=0).sum().sort_index()
+    return {
+        _plain(key): _bucket(added, deleted)
+        for key, added, deleted in zip(totals.index, totals['added'], totals['deleted'])
+    }
+
+
+def _series(partials: List[pd.DataFrame]) -> Dict:
+    if not partials:
+        return empty_series()
+    totals = pd.concat(partials).groupby(level=0).sum()
+    weeks = totals.index.to_numpy(dtype=np.int64)
+    start = int(weeks.min())
+    added = np.zeros(int(weeks.max()) - start + 1, dtype=np.int64)
+    deleted = np.zeros_like(added)
+    added[weeks - start] = totals['added'].to_numpy()
+    deleted[weeks - start] = totals['deleted'].to_numpy()
+    return {'start_week': start, 'added': added.tolist(), 'deleted': deleted.tolist()}
+
+
+class FileStats:
+    """Per-path line totals collected while a log is parsed, for breakdowns by file, extension and directory.
+
+    Rows are buffered and folded into one total per path every
+    ``COMPACT_ROWS`` rows, so memory grows with the number of distinct paths
+    touched, not with the length of the history.
+    """
+
+    def __init__(self, compact_rows: int = COMPACT_ROWS):
+        self.compact_rows = compact_rows
+        self._totals = pd.DataFrame({'added': [], 'deleted': []}, dtype=np.int64)
+        self._pending: List[pd.DataFrame] = []
+        self._pending_rows = 0
+
+    def add(self, changes: pd.DataFrame):
+        if changes.empty:
+            return
+        self._pending.append(changes)
+        self._pending_rows += len(changes)
+        if self._pending_rows >= self.compact_rows:
+            self._compact()
+
+    def totals(self) -> pd.DataFrame:
+        """``added``/``deleted`` per path, indexed by path."""
+        self._compact()
+        return self._totals
+
+    def breakdown(self, top_n: int = DEFAULT_TOP_N) -> Dict:
+        """The ``top_n`` extensions, top-level directories and files by lines changed.
+
+        Buckets have the usual ``added_lines``/``deleted_lines``/``total_lines``;
+        files without an extension are grouped under ``''`` and files at the
+        root of the repository under ``'.'``.
+        """
+        totals = self.totals()
+        paths = totals.index.to_series()
+        extensions = paths.str.extract(r'(\.[^./]+)$', expand=False).fillna('').str.lower()
+        directories = paths.str.extract(r'^([^/]+)/', expand=False).fillna('.')
+        return {
+            'extensions': _top(totals.groupby(extensions.to_numpy()).sum(), top_n),
+            'directories': _top(totals.groupby(directories.to_numpy()).sum(), top_n),
+            'top_files': [
+                {'path': path, **bucket} for path, bucket in _top(totals, top_n).items()
+            ]
+        }
+
+    def _compact(self):
+        if not self._pending:
+            return
+        frames = [self._totals.reset_index(names='path')] if len(self._totals) else []
+        merged = pd.concat(frames + self._pending, ignore_index=True)
+        self._totals = merged.groupby('path', sort=False)[['added', 'deleted']].sum()
+        self._pending = []
+        self._pending_rows = 0
+
+
+def _top(totals: pd.DataFrame, top_n: int) -> Dict:
+    """The ``top_n`` rows with the most lines changed (added plus deleted), as buckets."""
+    changed = totals['added'] + totals['deleted']
+    order = np.argsort(-changed.to_numpy(), kind='stable')[:top_n]
+    top = totals.iloc[order]
+    return {key: _bucket(added, deleted) for key, added, deleted in zip(top.index, top['added'], top['deleted'])}
@@ -0,0 +1,132 @@
+import fnmatch
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+# Paths left out of every analysis unless a rules file turns the defaults off:
+# lockfiles, vendored dependencies and generated or minified assets, which
+# dwarf hand-written changes in line counts and cost the most to diff.
+# Patterns follow .gitignore conventions (see ``to_pathspec``)
+DEFAULT_EXCLUDES = [
+    'package-lock.json',
+    'yarn.lock',
+    'pnpm-lock.yaml',
+    'npm-shrinkwrap.json',
+    'composer.lock',
+    'Gemfile.lock',
+    'Cargo.lock',
+    'poetry.lock',
+    'Pipfile.lock',
+    'uv.lock',
+    'go.sum',
+    'vendor/',
+    'node_modules/',
+    'third_party/',
+    'bower_components/',
+    'dist/',
+    '*.min.js',
+    '*.min.css',
+    '*.map',
+    '*.pb.go',
+    '*_pb2.py',
+    '*.snap'
+]
+
+
+class PathRules:
+    """Which paths count towards contributions, as git pathspecs.
+
+    ``exclude`` patterns (on top of ``DEFAULT_EXCLUDES`` while
+    ``use_defaults`` is set) are never diffed; with ``include`` patterns only
+    matching paths are. ``repos`` overrides the rules per repository: keys
+    are ``owner/name`` full names (``fnmatch`` wildcards allowed, e.g.
+    ``myorg/*``) mapping to their own ``include``, ``exclude`` and
+    ``use_defaults``, which add to (or, for ``use_defaults``, replace) the
+    global ones. The first matching key wins.
+    """
+
+    def __init__(self,
+                 exclude: Optional[List[str]] = None,
+                 include: Optional[List[str]] = None,
+                 use_defaults: bool = True,
+                 repos: Optional[Dict[str, Dict]] = None):
+        self.exclude = list(exclude or [])
+        self.include = list(include or [])
+        self.use_defaults = use_defaults
+        self.repos = dict(repos or {})
+
+    @classmethod
+    def from_dict(cls, config: Dict) -> 'PathRules':
+        unknown = set(config) - {'exclude', 'include', 'use_defaults', 'repos'}
+        if unknown:
+            raise ValueError(f"Unknown path rule keys: {', '.join(sorted(unknown))}")
+        return cls(
+            exclude=config.get('exclude'),
+            include=config.get('include'),
+            use_defaults=config.get('use_defaults', True),
+            repos=config.get('repos')
+        )
+
+    def to_dict(self) -> Dict:
+        return {'exclude': self.exclude, 'include': self.include, 'use_defaults': self.use_defaults, 'repos': self.repos}
+
+    def fingerprint(self) -> str:
+        """Short hash of the rules; results counted under different rules aren't comparable."""
+        rules = {**self.to_dict(), 'defaults': DEFAULT_EXCLUDES if self.use_defaults else []}
+        return hashlib.sha256(json.dumps(rules, sort_keys=True).encode()).hexdigest()[:12]
+
+    def pathspecs(self, repo: Optional[str] = None) -> List[str]:
+        """Git pathspecs for ``repo`` (a full name), to pass after ``--``; empty means every path."""
+        override = self._override(repo)
+        use_defaults = override.get('use_defaults', self.use_defaults)
+        exclude = (DEFAULT_EXCLUDES if use_defaults else []) + self.exclude + list(override.get('exclude', []))
+        include = self.include + list(override.get('include', []))
+        specs = [to_pathspec(pattern) for pattern in include]
+        specs += [to_pathspec(pattern, exclude=True) for pattern in exclude]
+        return specs
+
+    def _override(self, repo: Optional[str]) -> Dict:
+        if repo is None:
+            return {}
+        for pattern, override in self.repos.items():
+            if fnmatch.fnmatchcase(repo.lower(), pattern.lower()):
+                return override
+        return {}
+
+
+def to_pathspec(pattern: str, exclude: bool = False) -> str:
+    """Turn a .gitignore-style pattern into a ``:(glob)`` pathspec.
+
+    A pattern without a slash matches at any depth (``*.min.js``); a
+    trailing slash matches everything under a directory of that name
+    (``vendor/``); a leading slash anchors it to the repository root.
+    """
+    pattern = pattern.strip()
+    if not pattern:
+        raise ValueError("Empty path rule")
+    directory = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    if pattern.startswith('/'):
+        pattern = pattern.lstrip('/')
+    elif '/' not in pattern:
+        pattern = f'**/{pattern}'
+    if directory:
+        pattern = f'{pattern}/**'
+    magic = 'exclude,glob' if exclude else 'glob'
+    return f':({magic}){pattern}'
+
+
+def load_rules(path: str) -> PathRules:
+    """Read rules from a JSON file shaped like ``PathRules.to_dict``."""
+    with open(path) as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError(f"{path} must hold a JSON object")
+    return PathRules.from_dict(config)
+
+
+def default_rules() -> PathRules:
+    """Rules from the file named by ``PATH_RULES_FILE``, else just the defaults."""
+    path = os.environ.get('PATH_RULES_FILE')
+    return load_rules(path) if path else PathRules()
@@ -0,0 +1,187 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from timeseries import SeriesMatrix
+
+# How often a leaderboard pulls in users updated by other processes
+SYNC_INTERVAL = 30.0
+# Overlap between incremental syncs so writes landing mid-sync are not missed
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class RankIndex:
+    """Sorted index of users by net lines, supporting O(log n) rank lookups.
+
+    Entries are kept as ``(-net, username)`` so ascending order is the
+    leaderboard order, with ties broken by username. Users with equal net
+    lines share a rank (1, 2, 2, 4, ...).
+    """
+
+    def __init__(self):
+        self._entries: List[Tuple[int, str]] = []
+        self._scores: Dict[str, int] = {}
+
+    @classmethod
+    def from_scores(cls, scores: Iterable[Tuple[str, int]]) -> 'RankIndex':
+        """Build from ``(username, net)`` pairs with one sort, rather than an insertion each."""
+        index = cls()
+        index._scores = dict(scores)
+        index._entries = sorted((-net, username) for username, net in index._scores.items())
+        return index
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, username: str, net: int):
+        self.remove(username)
+        self._scores[username] = net
+        insort(self._entries, (-net, username))
+
+    def remove(self, username: str):
+        net = self._scores.pop(username, None)
+        if net is not None:
+            position = bisect_left(self._entries, (-net, username))
+            del self._entries[position]
+
+    def range(self, offset: int = 0, limit: int = 10) -> List[Tuple[str, int]]:
+        """``(username, net)`` pairs for ranks ``offset + 1`` .. ``offset + limit``."""
+        return [(username, -negated) for negated, username in self._entries[offset:offset + limit]]
+
+    def rank(self, username: str) -> Optional[int]:
+        net = self._scores.get(username)
+        if net is None:
+            return None
+        # Everyone strictly ahead sorts before (-net, ''), whatever their name
+        return bisect_left(self._entries, (-net, '')) + 1
+
+    def percentile(self, username: str) -> Optional[float]:
+        """Percentage of users with fewer net lines than ``username``."""
+        net = self._scores.get(username)
+        if net is None:
+            return None
+        # bisect_right on the next-lower score counts everyone at or above this one
+        at_or_above = bisect_right(self._entries, (-net, '\U0010ffff'))
+        return 100.0 * (len(self._entries) - at_or_above) / len(self._entries)
+
+
+class ChangeFeed:
+    """Documents of ``users`` matching ``query``, for views kept in memory and synced across processes.
+
+    The first ``changes`` returns every match; later ones only those whose
+    ``last_updated`` moved since the previous call (less ``SYNC_OVERLAP``, so
+    writes landing mid-sync are not missed). ``due`` says whether
+    ``SYNC_INTERVAL`` has passed since then.
+    """
+
+    def __init__(self, users, query: Dict, projection: Dict):
+        self.users = users
+        self.query = query
+        self.projection = projection
+        self._synced_at: Optional[datetime] = None
+        self._checked_at = 0.0
+
+    def due(self) -> bool:
+        return self._synced_at is None or time.monotonic() - self._checked_at > SYNC_INTERVAL
+
+    def changes(self) -> Iterable[Dict]:
+        started = datetime.utcnow()
+        query = dict(self.query)
+        if self._synced_at is not None:
+            query["last_updated"] = {"$gte": self._synced_at - SYNC_OVERLAP}
+        docs = self.users.find(query, self.projection)
+        self._synced_at = started
+        self._checked_at = time.monotonic()
+        return docs
+
+
+class Leaderboard:
+    """Materialized per-period rankings over the ``users`` collection.
+
+    Each period's ``RankIndex`` is loaded from Mongo on first use, updated
+    in place by ``record`` on every local write, and synced with writes from
+    other processes by querying only users whose ``last_updated`` moved.
+    """
+
+    def __init__(self, users):
+        self.users = users
+        self._indexes: Dict[str, RankIndex] = {}
+        self._feeds: Dict[str, ChangeFeed] = {}
+        self._lock = threading.Lock()
+
+    def record(self, username: str, doc: Dict):
+        """Apply a freshly written user document to every loaded period."""
+        with self._lock:
+            for period, index in self._indexes.items():
+                stats = doc.get(period)
+                if stats is not None:
+                    index.update(username, stats["total_net"])
+
+    def top(self, period: str, offset: int = 0, limit: int = 10) -> List[Tuple[str, int]]:
+        with self._lock:
+            return self._index(period).range(offset, limit)
+
+    def rank(self, period: str, username: str) -> Optional[Dict]:
+        """Rank, number of ranked users and percentile of ``username``, if ranked."""
+        with self._lock:
+            index = self._index(period)
+            rank = index.rank(username)
+            if rank is None:
+                return None
+            return {"rank": rank, "total": len(index), "percentile": index.percentile(username)}
+
+    def _index(self, period: str) -> RankIndex:
+        feed = self._feeds.get(period)
+        if feed is None:
+            feed = self._feeds[period] = ChangeFeed(
+                self.users, {f"{period}.total_net": {"$exists": True}}, {"username": 1, period: 1, "_id": 0}
+            )
+            # Sorted once; update's insertions are for the few users each sync brings in
+            self._indexes[period] = RankIndex.from_scores(
+                (doc["username"], doc[period]["total_net"]) for doc in feed.changes()
+            )
+        elif feed.due():
+            index = self._indexes[period]
+            for doc in feed.changes():
+                index.update(doc["username"], doc[period]["total_net"])
+        return self._indexes[period]
+
+
+class SeriesIndex:
+    """Materialized weekly series of every user, for rolling-period rankings.
+
+    Like ``Leaderboard``: loaded from Mongo on first use, updated by
+    ``record`` on local writes and synced with other processes' writes
+    through ``last_updated``. The ``SeriesMatrix`` over all users is rebuilt
+    only when a series changed since the last read.
+    """
+
+    def __init__(self, users):
+        self.users = users
+        self._series: Optional[Dict[str, Dict]] = None
+        self._matrix: Optional[SeriesMatrix] = None
+        self._feed = ChangeFeed(users, {"series": {"$exists": True}}, {"username": 1, "series": 1, "_id": 0})
+        self._lock = threading.Lock()
+
+    def record(self, username: str, doc: Dict):
+        """Apply a freshly written user document, if it carries a series."""
+        with self._lock:
+            if self._series is not None and doc.get("series") is not None:
+                self._series[username] = doc["series"]
+                self._matrix = None
+
+    def matrix(self) -> SeriesMatrix:
+        with self._lock:
+            if self._series is None:
+                self._series = {doc["username"]: doc["series"] for doc in self._feed.changes()}
+            elif self._feed.due():
+                for doc in self._feed.changes():
+                    self._series[doc["username"]] = doc["series"]
+                    self._matrix = None
+            if self._matrix is None:
+                self._matrix = SeriesMatrix.from_docs(
+                    {"username": username, "series": series} for username, series in self._series.items()
+                )
+            return self._matrix
@@ -0,0 +1,225 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import requests
+
+# Calls kept in hand per token so concurrent requests never run the budget to zero
+DEFAULT_RESERVE = 20
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF = 1.0
+# GitHub asks clients hit by a secondary rate limit without Retry-After to wait a minute
+SECONDARY_LIMIT_WAIT = 60.0
+# Longest we block waiting for a budget to refill before letting the call fail
+DEFAULT_MAX_WAIT = 15 * 60.0
+
+
+class _Budget:
+    def __init__(self):
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.paused_until = 0.0
+        self.in_flight = 0
+
+
+class RateLimiter:
+    """Schedules GitHub API calls around each token's rate limit budget.
+
+    Budgets are learned from ``X-RateLimit-Remaining``/``X-RateLimit-Reset``
+    on every response. Before sending, a call waits while the token's
+    remaining budget (less the calls already in flight) is within
+    ``reserve`` of exhaustion, or while the token is paused after a
+    secondary rate limit. Rate-limited (403/429) and 5xx responses are
+    retried up to ``max_retries`` times, honouring ``Retry-After`` and
+    otherwise backing off exponentially.
+
+    Calls marked public (read-only endpoints that need no particular
+    identity) are spread over ``token_pool``, always using the token with
+    the most budget left.
+
+    ``request`` schedules blocking calls and ``arequest`` coroutines; both
+    draw on the same budgets.
+    """
+
+    def __init__(self,
+                 token_pool: Optional[List[str]] = None,
+                 reserve: int = DEFAULT_RESERVE,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF,
+                 max_wait: float = DEFAULT_MAX_WAIT):
+        self.token_pool = [token for token in (token_pool or []) if token]
+        self.reserve = reserve
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self._budgets: Dict[str, _Budget] = {}
+        self._condition = threading.Condition()
+
+    def request(self,
+                send: Callable[[Optional[str]], requests.Response],
+                token: Optional[str] = None,
+                public: bool = False) -> requests.Response:
+        """Run ``send`` under the budget of ``token`` (or a pooled token if ``public``).
+
+        ``send`` receives the pooled token to authenticate with, or None to
+        keep the caller's own credentials.
+        """
+        token = token or ''
+        for attempt in range(self.max_retries + 1):
+            chosen = self._choose(token, public)
+            self._acquire(chosen)
+            response = None
+            try:
+                response = send(chosen if chosen != token else None)
+            finally:
+                self._release(chosen, response)
+
+            delay = self._retry_delay(chosen, response, attempt)
+            if delay is None or attempt == self.max_retries:
+                return response
+            if delay:
+                time.sleep(delay)
+        return response
+
+    async def arequest(self,
+                       send: Callable[[Optional[str]], Awaitable],
+                       token: Optional[str] = None,
+                       public: bool = False):
+        """``request`` for a coroutine ``send``, waiting without blocking the event loop."""
+        token = token or ''
+        for attempt in range(self.max_retries + 1):
+            chosen = self._choose(token, public)
+            await self._acquire_async(chosen)
+            response = None
+            try:
+                response = await send(chosen if chosen != token else None)
+            finally:
+                self._release(chosen, response)
+
+            delay = self._retry_delay(chosen, response, attempt)
+            if delay is None or attempt == self.max_retries:
+                return response
+            if delay:
+                await asyncio.sleep(delay)
+        return response
+
+    def budgets(self) -> Dict[str, Dict]:
+        """Snapshot of the known budget per token, keyed by a redacted token."""
+        with self._condition:
+            return {
+                (token[-4:].rjust(8, '*') if token else 'anonymous'): {
+                    'remaining': budget.remaining,
+                    'reset_at': budget.reset_at,
+                    'in_flight': budget.in_flight
+                }
+                for token, budget in self._budgets.items()
+            }
+
+    def _choose(self, token: str, public: bool) -> str:
+        if not public or not self.token_pool:
+            return token
+        candidates = ([token] if token else []) + self.token_pool
+        with self._condition:
+            now = time.time()
+            return max(candidates, key=lambda candidate: self._headroom(candidate, now))
+
+    def _headroom(self, token: str, now: float) -> float:
+        budget = self._budgets.get(token)
+        if budget is None:
+            return float('inf')
+        if budget.paused_until > now:
+            return float('-inf')
+        if budget.remaining is None or budget.reset_at <= now:
+            return float('inf')
+        return budget.remaining - budget.in_flight
+
+    def _acquire(self, token: str):
+        give_up_at = time.time() + self.max_wait
+        with self._condition:
+            while True:
+                wait = self._try_acquire(token, give_up_at)
+                if wait is None:
+                    return
+                self._condition.wait(wait)
+
+    async def _acquire_async(self, token: str):
+        give_up_at = time.time() + self.max_wait
+        while True:
+            with self._condition:
+                wait = self._try_acquire(token, give_up_at)
+            if wait is None:
+                return
+            await asyncio.sleep(wait)
+
+    def _try_acquire(self, token: str, give_up_at: float) -> Optional[float]:
+        """Count a call in flight on ``token`` and return None, or return how long to wait first.
+
+        Must be called with ``_condition`` held.
+        """
+        budget = self._budgets.setdefault(token, _Budget())
+        now = time.time()
+        if budget.reset_at and budget.reset_at <= now:
+            # The window rolled over; the next response tells us the new budget
+            budget.remaining = None
+            budget.reset_at = 0.0
+        if budget.paused_until > now:
+            wait_until = budget.paused_until
+        elif budget.remaining is not None and budget.remaining - budget.in_flight <= self.reserve:
+            wait_until = budget.reset_at
+        else:
+            wait_until = None
+        if wait_until is None or now >= give_up_at:
+            budget.in_flight += 1
+            return None
+        return min(wait_until, give_up_at) - now
+
+    def _release(self, token: str, response: Optional[requests.Response]):
+        with self._condition:
+            budget = self._budgets[token]
+            budget.in_flight -= 1
+            if response is not None:
+                remaining = response.headers.get('X-RateLimit-Remaining')
+                reset = response.headers.get('X-RateLimit-Reset')
+                if remaining is not None and reset is not None:
+                    budget.remaining = int(remaining)
+                    budget.reset_at = float(reset)
+            self._condition.notify_all()
+
+    def _retry_delay(self, token: str, response: Optional[requests.Response], attempt: int) -> Optional[float]:
+        """Seconds to sleep before retrying ``response``, or None if it should be returned.
+
+        Rate-limited responses pause the token instead of sleeping here.
+        """
+        if response is None:
+            return None
+        status = response.status_code
+        if status >= 500:
+            return self.backoff * 2 ** attempt
+        if status not in (403, 429):
+            return None
+
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None:
+            delay = float(retry_after)
+        elif response.headers.get('X-RateLimit-Remaining') == '0':
+            delay = float(response.headers.get('X-RateLimit-Reset', time.time())) - time.time()
+        elif 'rate limit' in response.text.lower():
+            delay = max(SECONDARY_LIMIT_WAIT, self.backoff * 2 ** attempt)
+        else:
+            # A plain permission error; retrying will not help
+            return None
+
+        delay = max(min(delay, self.max_wait), 0.0)
+        with self._condition:
+            # Pause every caller sharing this token, not just this one; the
+            # retry then waits in _acquire, or moves to another pooled token
+            budget = self._budgets[token]
+            budget.paused_until = max(budget.paused_until, time.time() + delay)
+        return 0.0
+
+
+def token_pool_from_env() -> List[str]:
+    """Read extra tokens for public calls from the comma-separated ``GITHUB_TOKEN_POOL``."""
+    return [token.strip() for token in os.environ.get('GITHUB_TOKEN_POOL', '').split(',') if token.strip()]
@@ -0,0 +1,224 @@
+import errno
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import telemetry
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process locks apply
+    fcntl = None
+
+DEFAULT_CACHE_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'git-contributions', 'repos')
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+
+# Only branches and tags are mirrored; GitHub's refs/pull/* would drag in
+# unmerged commits from forks
+FETCH_REFSPECS = ['+refs/heads/*:refs/heads/*', '+refs/tags/*:refs/tags/*']
+
+
+class RepoCache:
+    """On-disk cache of bare repository mirrors keyed by ``owner/name``.
+
+    The first request for a repository clones it; later requests only fetch
+    what changed upstream. When the cache grows past ``max_bytes`` the least
+    recently used mirrors are removed.
+
+    Mirrors are locked per thread and, through ``<mirror>.lock`` files, across
+    processes, so job workers sharing a cache root don't clone, fetch or
+    evict the same mirror at once. Each mirror's size is recorded in a
+    ``<mirror>.size`` file when it is fetched, so eviction doesn't have to
+    walk the whole cache.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or os.environ.get('REPO_CACHE_DIR') or DEFAULT_CACHE_ROOT
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_MAX_BYTES
+        os.makedirs(self.root, exist_ok=True)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def path_for(self, full_name: str) -> str:
+        owner, _, name = full_name.partition('/')
+        safe = [re.sub(r'[^A-Za-z0-9._-]', '_', part) for part in (owner, name or owner)]
+        return os.path.join(self.root, safe[0], f'{safe[1]}.git')
+
+    def has_mirror(self, full_name: str) -> bool:
+        return os.path.isdir(self.path_for(full_name))
+
+    @contextmanager
+    def mirror(self, full_name: str, url: str, timeout: Optional[float] = None, branch: Optional[str] = None):
+        """Bring the mirror for ``full_name`` up to date and yield its path.
+
+        The mirror is locked for the duration of the ``with`` block so it is
+        neither fetched into nor evicted while it is being read. ``timeout``
+        bounds the clone or fetch, in seconds. With ``branch`` only that
+        branch is cloned or updated; other refs already in the mirror are
+        left as they are.
+        """
+        path = self.path_for(full_name)
+        lock = self._lock_for_path(path)
+        with telemetry.span('mirror_wait', repo=full_name):
+            lock.acquire()
+            lock_file = _lock_file(path)
+        try:
+            if os.path.isdir(path):
+                size_before = _recorded_size(path)
+                if size_before is None:
+                    size_before = dir_size(path)
+                with telemetry.span('fetch', repo=full_name):
+                    self._fetch(path, url, timeout, branch)
+            else:
+                size_before = 0
+                with telemetry.span('clone', repo=full_name):
+                    self._clone(path, url, timeout, branch)
+            size = dir_size(path)
+            _record_size(path, size)
+            telemetry.count('bytes_fetched', max(size - size_before, 0))
+            os.utime(path)
+            yield path
+        finally:
+            _unlock_file(lock_file)
+            lock.release()
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used mirrors until the cache fits in ``max_bytes``."""
+        mirrors = []
+        for owner in os.listdir(self.root):
+            owner_dir = os.path.join(self.root, owner)
+            if not os.path.isdir(owner_dir):
+                continue
+            for name in os.listdir(owner_dir):
+                path = os.path.join(owner_dir, name)
+                # Skip clones that are still being staged
+                if name.startswith('.') or not os.path.isdir(path):
+                    continue
+                size = _recorded_size(path)
+                if size is None:
+                    # Mirrors from before sizes were recorded; the next fetch records it
+                    size = dir_size(path)
+                mirrors.append((os.path.getmtime(path), path, size))
+
+        total = sum(size for _, _, size in mirrors)
+        for _, path, size in sorted(mirrors):
+            if total <= self.max_bytes:
+                break
+            lock = self._lock_for_path(path)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                # Another process may be reading or updating it
+                lock_file = _lock_file(path, blocking=False)
+                if lock_file is False:
+                    continue
+                try:
+                    shutil.rmtree(path, ignore_errors=True)
+                    try:
+                        os.remove(f'{path}.size')
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                finally:
+                    _unlock_file(lock_file)
+            finally:
+                lock.release()
+
+    def _clone(self, path: str, url: str, timeout: Optional[float] = None, branch: Optional[str] = None):
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok=True)
+        # Clone next to the final location and rename, so an interrupted
+        # clone never leaves a half-populated mirror behind
+        staging = tempfile.mkdtemp(dir=parent, prefix='.clone-')
+        try:
+            single_branch = ['--single-branch', '--branch', branch] if branch else []
+            _git(['clone', '--bare', '--quiet', *single_branch, url, staging], timeout=timeout)
+            # Keep credentials out of the persisted config; fetches pass the URL explicitly
+            _git(['remote', 'remove', 'origin'], cwd=staging)
+            try:
+                os.rename(staging, path)
+            except OSError as e:
+                # Lost a race with a process that doesn't take the lock
+                # file (e.g. on Windows); its mirror is just as good
+                if e.errno not in (errno.EEXIST, errno.ENOTEMPTY) or not os.path.isdir(path):
+                    raise
+                shutil.rmtree(staging, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def _fetch(self, path: str, url: str, timeout: Optional[float] = None, branch: Optional[str] = None):
+        if branch:
+            # --prune would delete every other mirrored branch
+            _git(['fetch', '--quiet', '--no-tags', url, f'+refs/heads/{branch}:refs/heads/{branch}'], cwd=path, timeout=timeout)
+            return
+        _git(['fetch', '--prune', '--quiet', url, *FETCH_REFSPECS], cwd=path, timeout=timeout)
+
+    def _lock_for_path(self, path: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+
+def _lock_file(path: str, blocking: bool = True):
+    """Take the inter-process lock on the mirror at ``path``.
+
+    Returns the open lock file to pass to ``_unlock_file``, None where file
+    locks aren't available, or False if ``blocking`` is off and another
+    process holds the lock.
+    """
+    if fcntl is None:
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock_file = open(f'{path}.lock', 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return False
+    except BaseException:
+        lock_file.close()
+        raise
+    return lock_file
+
+
+def _unlock_file(lock_file):
+    if lock_file:
+        # Closing the file releases the lock
+        lock_file.close()
+
+
+def _recorded_size(path: str) -> Optional[int]:
+    try:
+        with open(f'{path}.size') as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _record_size(path: str, size: int):
+    # Write and rename so a concurrent evict() never reads a partial number
+    staging = f'{path}.size.tmp'
+    with open(staging, 'w') as f:
+        f.write(str(size))
+    os.replace(staging, f'{path}.size')
+
+
+def _git(args, cwd: Optional[str] = None, timeout: Optional[float] = None):
+    subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True, timeout=timeout)
+
+
+def dir_size(path: str) -> int:
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+    return size
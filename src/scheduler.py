@@ -0,0 +1,131 @@
+import heapq
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+FULL = 'full'
+DEGRADED = 'degraded'
+SKIPPED = 'skipped'
+
+# Starting guesses for the ETA until real repositories have been timed:
+# fixed cost per repository (process start, round trips) and clone+walk speed
+DEFAULT_REPO_OVERHEAD = 1.0
+DEFAULT_KB_PER_SECOND = 5 * 1024.0
+
+
+class Schedule:
+    """Order repositories by their API ``size`` and estimate when the run will finish.
+
+    Tasks run largest first, so the biggest repository starts immediately
+    instead of being picked up last and leaving every other worker idle
+    while it finishes. Repositories larger than ``max_size_kb`` are skipped
+    and those larger than ``degraded_size_kb`` are analyzed in degraded mode
+    (default branch only). Sizes are GitHub's, in KB.
+
+    ``eta`` simulates the remaining queue on ``max_workers`` workers, using a
+    throughput learned from the repositories finished so far.
+
+    When one schedule covers several users, ``usernames`` (parallel to
+    ``repos``) records whose repository each task is.
+    """
+
+    def __init__(self,
+                 repos: List[Dict],
+                 max_workers: int,
+                 max_size_kb: Optional[int] = None,
+                 degraded_size_kb: Optional[int] = None,
+                 usernames: Optional[List[str]] = None):
+        self.max_workers = max_workers
+        self.tasks = []
+        owned = zip(usernames or [None] * len(repos), repos)
+        for username, repo in sorted(owned, key=lambda pair: pair[1].get('size') or 0, reverse=True):
+            size = repo.get('size') or 0
+            if max_size_kb is not None and size > max_size_kb:
+                mode = SKIPPED
+            elif degraded_size_kb is not None and size > degraded_size_kb and repo.get('default_branch'):
+                mode = DEGRADED
+            else:
+                mode = FULL
+            self.tasks.append({'repo': repo, 'mode': mode, 'size_kb': size, 'username': username})
+        self._started: Dict[Tuple, float] = {}
+        self._finished: Dict[Tuple, float] = {}
+        self._done_kb = 0.0
+        self._done_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def runnable(self) -> List[Dict]:
+        return [task for task in self.tasks if task['mode'] != SKIPPED]
+
+    def skipped(self) -> List[Dict]:
+        return [task for task in self.tasks if task['mode'] == SKIPPED]
+
+    def start(self, task: Dict):
+        with self._lock:
+            self._started[_key(task)] = time.monotonic()
+
+    def finish(self, task: Dict):
+        with self._lock:
+            key = _key(task)
+            started = self._started.get(key)
+            if started is None or key in self._finished:
+                return
+            elapsed = time.monotonic() - started
+            self._finished[key] = elapsed
+            self._done_kb += task['size_kb']
+            self._done_seconds += max(elapsed - DEFAULT_REPO_OVERHEAD, 0.0)
+
+    def skip(self, task: Dict):
+        """Mark a task done without running it; it no longer counts towards the ETA or the throughput."""
+        with self._lock:
+            self._finished.setdefault(_key(task), 0.0)
+
+    def kb_per_second(self) -> float:
+        """Throughput seen so far, or the default until enough data has been moved."""
+        if self._done_seconds < 1.0:
+            return DEFAULT_KB_PER_SECOND
+        return max(self._done_kb / self._done_seconds, 1.0)
+
+    def estimate(self, task: Dict) -> float:
+        return DEFAULT_REPO_OVERHEAD + task['size_kb'] / self.kb_per_second()
+
+    def eta(self) -> float:
+        """Seconds until every runnable task is expected to have finished."""
+        with self._lock:
+            now = time.monotonic()
+            # Each worker is free once its current task is expected to end
+            workers = []
+            queued = []
+            for task in self.runnable():
+                key = _key(task)
+                if key in self._finished:
+                    continue
+                if key in self._started:
+                    workers.append(max(self.estimate(task) - (now - self._started[key]), 0.0))
+                else:
+                    queued.append(task)
+            workers += [0.0] * max(self.max_workers - len(workers), 0)
+            heapq.heapify(workers)
+            for task in queued:
+                heapq.heappush(workers, heapq.heappop(workers) + self.estimate(task))
+            return max(workers) if workers else 0.0
+
+
+def _key(task: Dict) -> Tuple[Optional[str], str]:
+    repo = task['repo']
+    return task.get('username'), repo.get('full_name') or repo['name']
+
+
+def format_size(size_kb: float) -> str:
+    if size_kb >= 1024 ** 2:
+        return f"{size_kb / 1024 ** 2:.1f} GB"
+    if size_kb >= 1024:
+        return f"{size_kb / 1024:.0f} MB"
+    return f"{size_kb:.0f} KB"
+
+
+def format_eta(seconds: float) -> str:
+    if seconds < 60:
+        return "less than a minute"
+    if seconds < 3600:
+        return f"about {round(seconds / 60)} min"
+    return f"about {seconds / 3600:.1f} h"
@@ -0,0 +1,56 @@
+import threading
+from bisect import bisect_left, insort
+from typing import List, Tuple
+
+from ranking import ChangeFeed
+
+
+class UsernamePrefixIndex:
+    """In-memory sorted list of usernames for typeahead suggestions.
+
+    Usernames are kept as ``(lowercase, original)`` pairs so a prefix lookup
+    is a binary search followed by a short forward scan. The index loads the
+    usernames once, is updated in place by ``add`` on local writes and picks
+    up users added by other processes through their ``last_updated`` field.
+    """
+
+    def __init__(self, users):
+        self.users = users
+        self._entries: List[Tuple[str, str]] = []
+        self._known = set()
+        self._loaded = False
+        self._feed = ChangeFeed(users, {}, {"username": 1, "_id": 0})
+        self._lock = threading.Lock()
+
+    def add(self, username: str):
+        with self._lock:
+            if self._loaded:
+                self._insert(username)
+
+    def suggest(self, prefix: str, limit: int = 5) -> List[str]:
+        """Usernames starting with ``prefix`` (case-insensitive), in alphabetical order."""
+        prefix = prefix.strip().lower()
+        with self._lock:
+            self._refresh()
+            start = bisect_left(self._entries, (prefix, ''))
+            matches = []
+            for lowered, username in self._entries[start:start + limit]:
+                if not lowered.startswith(prefix):
+                    break
+                matches.append(username)
+            return matches
+
+    def _refresh(self):
+        if not self._loaded:
+            # Sorted once; _insert's insertions are for the few users each sync brings in
+            self._known = {doc["username"] for doc in self._feed.changes()}
+            self._entries = sorted((username.lower(), username) for username in self._known)
+            self._loaded = True
+        elif self._feed.due():
+            for doc in self._feed.changes():
+                self._insert(doc["username"])
+
+    def _insert(self, username: str):
+        if username not in self._known:
+            self._known.add(username)
+            insort(self._entries, (username.lower(), username))
@@ -0,0 +1,141 @@
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional
+
+DEFAULT_CACHE_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'git-contributions', 'share-images')
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+# Renders run in this many worker processes; more requests queue up
+DEFAULT_WORKERS = 1
+# Bump when the image layout changes so old renders aren't served
+RENDER_VERSION = 1
+
+
+class ShareImageCache:
+    """Content-addressed disk cache of social share images, rendered in a process pool.
+
+    Images are keyed by everything drawn on them, the verification hash
+    included, so a given result is rendered once and then served from disk.
+    Rendering happens in ``max_workers`` spawned processes, off the request
+    path and without competing with the web server for the GIL. Images older
+    than ``max_age`` seconds are removed, then the least recently served ones
+    until the cache fits in ``max_bytes``.
+    """
+
+    def __init__(self,
+                 root: Optional[str] = None,
+                 max_bytes: Optional[int] = None,
+                 max_age: Optional[float] = None,
+                 max_workers: int = DEFAULT_WORKERS):
+        self.root = root or os.environ.get('SHARE_IMAGE_DIR') or DEFAULT_CACHE_ROOT
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_MAX_BYTES
+        self.max_age = max_age if max_age is not None else DEFAULT_MAX_AGE
+        self.max_workers = max_workers
+        os.makedirs(self.root, exist_ok=True)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, username: str, added: int, deleted: int, verification_hash: str) -> str:
+        key = hashlib.sha256(
+            f"{RENDER_VERSION}\x1f{username}\x1f{added}\x1f{deleted}\x1f{verification_hash}".encode()
+        ).hexdigest()
+        return os.path.join(self.root, key[:2], f'{key}.png')
+
+    def get(self, username: str, added: int, deleted: int, verification_hash: str) -> Optional[str]:
+        """Path of the cached image, or None if it hasn't been rendered yet."""
+        path = self.path_for(username, added, deleted, verification_hash)
+        try:
+            # Served images count as recently used for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def request(self, username: str, added: int, deleted: int, verification_hash: str) -> Future:
+        """Future for the image's path, rendering it in the background unless cached or already queued."""
+        path = self.path_for(username, added, deleted, verification_hash)
+        with self._lock:
+            if path in self._pending:
+                return self._pending[path]
+            if self.get(username, added, deleted, verification_hash):
+                future = Future()
+                future.set_result(path)
+                return future
+            future = self._executor().submit(render_share_image, path, username, added, deleted, verification_hash)
+            self._pending[path] = future
+        future.add_done_callback(lambda _: self._finished(path))
+        return future
+
+    def evict(self):
+        """Drop images older than ``max_age``, then least recently used ones until under ``max_bytes``."""
+        now = time.time()
+        images = []
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                # Skip renders still being written
+                if not name.endswith('.png'):
+                    continue
+                path = os.path.join(shard_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                images.append((stat.st_mtime, path, stat.st_size))
+
+        total = sum(size for _, _, size in images)
+        for used, path, size in sorted(images):
+            if total <= self.max_bytes and now - used <= self.max_age:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def _finished(self, path: str):
+        with self._lock:
+            self._pending.pop(path, None)
+        self.evict()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawn rather than fork: the parent may be a multi-threaded Streamlit server
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+
+def render_share_image(path: str, username: str, added: int, deleted: int, verification_hash: str) -> str:
+    """Draw the share card for a result to ``path`` (PNG), atomically; runs in a pool worker."""
+    # Imported here so only the render workers load matplotlib; the Figure
+    # API with the Agg canvas needs no pyplot state or display
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(12, 6), facecolor='#0D1117')
+    FigureCanvasAgg(figure)
+    figure.text(0.5, 0.8, f"GitHub Contributions by @{username}", ha='center', va='center', fontsize=24, color='#ffffff')
+    figure.text(0.5, 0.6, f"Added: {added:,} lines", ha='center', va='center', fontsize=20, color='#00ff00')
+    figure.text(0.5, 0.4, f"Deleted: {deleted:,} lines", ha='center', va='center', fontsize=20, color='#ff0000')
+    figure.text(0.5, 0.2, f"Net Change: {added - deleted:,} lines", ha='center', va='center', fontsize=20, color='#ffffff')
+    figure.text(0.5, 0.1, f"Verification: #{verification_hash}", ha='center', va='center', fontsize=16, color='#888888')
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write next to the final path and rename, so readers never see a partial image
+    fd, staging = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            figure.savefig(f, format='png', facecolor=figure.get_facecolor())
+        os.replace(staging, path)
+    except BaseException:
+        os.remove(staging)
+        raise
+    return path
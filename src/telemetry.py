@@ -0,0 +1,205 @@
+import contextvars
+import cProfile
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Optional
+
+_current: contextvars.ContextVar[Optional['Trace']] = contextvars.ContextVar('trace', default=None)
+# Attributes of the enclosing spans, inherited by nested ones (e.g. the repository)
+_inherited: contextvars.ContextVar[Dict] = contextvars.ContextVar('span_attributes', default={})
+# Only one cProfile profiler can be enabled per process (Python 3.12+ refuses
+# a second one, even from another thread), so profiled spans take turns: a
+# span that finds the profiler busy runs unprofiled
+_profiler_lock = threading.Lock()
+_log_lock = threading.Lock()
+_profile_numbers = itertools.count(1)
+
+
+class Trace:
+    """Timing spans and counters collected over one analysis (a user, or a batch).
+
+    Each span records a stage name (``clone``, ``fetch``, ``git_log``,
+    ``api``, ``store_commits``...), its offset from the start of the trace,
+    its duration and free-form attributes such as the repository, which
+    nested spans inherit. Counters
+    accumulate totals like ``bytes_fetched``, ``commits_walked`` and
+    ``api_calls``. Spans and counters may be added from any thread.
+
+    With ``profile_dir`` set, spans opened with ``profile=True`` also run
+    under cProfile and dump their stats there, one ``.prof`` file each.
+    One span is profiled at a time per process; spans that start while
+    another is being profiled (e.g. other repositories in the pool) aren't.
+    """
+
+    def __init__(self, name: str, profile_dir: Optional[str] = None, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.profile_dir = profile_dir
+        self.started_at = time.time()
+        self.seconds: Optional[float] = None
+        self.spans: List[Dict] = []
+        self.counters: Dict[str, int] = defaultdict(int)
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage: str, profile: bool = False, **attributes):
+        attributes = {**_inherited.get(), **attributes}
+        token = _inherited.set(attributes)
+        profiler = None
+        started = time.perf_counter()
+        error = None
+        try:
+            if profile:
+                profiler = self._start_profiler()
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            ended = time.perf_counter()
+            _inherited.reset(token)
+            if profiler is not None:
+                self._stop_profiler(profiler, stage, attributes)
+            record = {
+                'stage': stage,
+                'offset': round(started - self._started, 6),
+                'seconds': round(ended - started, 6),
+                **attributes
+            }
+            if error:
+                record['error'] = error
+            with self._lock:
+                self.spans.append(record)
+
+    def count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._started
+
+    def stages(self) -> Dict[str, Dict]:
+        """Per-stage totals: number of spans, summed and longest duration."""
+        totals: Dict[str, Dict] = {}
+        with self._lock:
+            for record in self.spans:
+                stage = totals.setdefault(record['stage'], {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+                stage['count'] += 1
+                stage['seconds'] += record['seconds']
+                stage['max_seconds'] = max(stage['max_seconds'], record['seconds'])
+        return totals
+
+    def to_dict(self) -> Dict:
+        seconds = self.seconds if self.seconds is not None else time.perf_counter() - self._started
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        return {
+            'trace': self.name,
+            **self.attributes,
+            'started_at': self.started_at,
+            'seconds': round(seconds, 6),
+            'stages': self.stages(),
+            'counters': counters,
+            'spans': spans
+        }
+
+    def _start_profiler(self) -> Optional[cProfile.Profile]:
+        if not self.profile_dir or not _profiler_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Some other profiling tool (a debugger, an outer cProfile) is active
+            _profiler_lock.release()
+            print(f"Profiling skipped: {e}")
+            return None
+        return profiler
+
+    def _stop_profiler(self, profiler: cProfile.Profile, stage: str, attributes: Dict):
+        try:
+            profiler.disable()
+        finally:
+            _profiler_lock.release()
+        label = '-'.join(str(value) for value in (self.name, stage, *attributes.values()))
+        label = re.sub(r'[^A-Za-z0-9._-]', '_', label)[:120]
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{label}-{os.getpid()}-{next(_profile_numbers)}.prof"))
+        except OSError as e:
+            print(f"Error writing profile: {e}")
+
+
+@contextmanager
+def start_trace(name: str, profile_dir: Optional[str] = None, log_path: Optional[str] = None, **attributes):
+    """Collect spans and counters from everything run inside the block (and its propagated threads).
+
+    When the block ends the trace is written as one JSON line to ``log_path``,
+    defaulting to the ``TELEMETRY_LOG`` environment variable (``-`` means
+    stderr); without either nothing is logged. ``profile_dir`` defaults to
+    ``PROFILE_DIR``.
+    """
+    trace = Trace(name, profile_dir=profile_dir or os.environ.get('PROFILE_DIR'), **attributes)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        trace.finish()
+        write_log(trace, log_path or os.environ.get('TELEMETRY_LOG'))
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def span(stage: str, profile: bool = False, **attributes):
+    """Time a stage of the current trace; does nothing outside of ``start_trace``."""
+    trace = _current.get()
+    if trace is None:
+        return nullcontext()
+    return trace.span(stage, profile=profile, **attributes)
+
+
+def count(counter: str, amount: int = 1):
+    trace = _current.get()
+    if trace is not None:
+        trace.count(counter, amount)
+
+
+def propagate(func: Callable) -> Callable:
+    """Bind ``func`` to a copy of the caller's context, so a pool thread records into its trace.
+
+    Call once per submitted task; a context can't be entered by two threads at once.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.run(func, *args, **kwargs)
+    return run
+
+
+def write_log(trace: Trace, path: Optional[str]):
+    """Append ``trace`` as a JSON line to ``path`` (``-`` for stderr)."""
+    if not path:
+        return
+    line = json.dumps(trace.to_dict(), default=str) + '\n'
+    with _log_lock:
+        if path == '-':
+            sys.stderr.write(line)
+            sys.stderr.flush()
+            return
+        try:
+            with open(path, 'a') as f:
+                f.write(line)
+        except OSError as e:
+            print(f"Error writing telemetry log: {e}")
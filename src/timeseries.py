@@ -0,0 +1,187 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Weeks are numbered from the first Monday of the Unix epoch, so week 0
+# starts on 1970-01-05 and every week runs Monday to Sunday (UTC)
+EPOCH_MONDAY = datetime(1970, 1, 5, tzinfo=timezone.utc)
+SECONDS_PER_WEEK = 7 * 24 * 3600
+
+# Field names of periods kept on each user document (and so rankable by ``Leaderboard``)
+YEAR_PERIOD = re.compile(r'^year_(\d{4})$')
+# Periods computed from the weekly series at read time; they move with the calendar
+ROLLING_PERIODS = {
+    'last_90_days': timedelta(days=90),
+    'rolling_12_months': timedelta(days=365)
+}
+
+
+def week_of(timestamp: float) -> int:
+    """Week number of a Unix timestamp."""
+    return int((timestamp - EPOCH_MONDAY.timestamp()) // SECONDS_PER_WEEK)
+
+
+def week_start(week: int) -> datetime:
+    return EPOCH_MONDAY + timedelta(weeks=week)
+
+
+def empty_series() -> Dict:
+    return {'start_week': 0, 'added': [], 'deleted': []}
+
+
+def series_from_weeks(weeks: Dict[int, Dict]) -> Dict:
+    """Pack ``{week: {'added', 'deleted'}}`` into dense arrays starting at the first active week.
+
+    A series is ``start_week`` plus one ``added`` and one ``deleted`` count
+    per week, quiet weeks included (see ``encode_series`` for storage).
+    """
+    if not weeks:
+        return empty_series()
+    start = min(weeks)
+    length = max(weeks) - start + 1
+    added = [0] * length
+    deleted = [0] * length
+    for week, counts in weeks.items():
+        added[week - start] += counts['added']
+        deleted[week - start] += counts['deleted']
+    return {'start_week': start, 'added': added, 'deleted': deleted}
+
+
+def series_from_days(days: Dict[str, Dict]) -> Dict:
+    """Weekly series from ``{'YYYY-MM-DD': {'added', 'deleted'}}``."""
+    weeks: Dict[int, Dict] = {}
+    for day, counts in days.items():
+        moment = datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+        week = weeks.setdefault(week_of(moment.timestamp()), {'added': 0, 'deleted': 0})
+        week['added'] += counts['added']
+        week['deleted'] += counts['deleted']
+    return series_from_weeks(weeks)
+
+
+def sum_series(series: Iterable[Dict]) -> Dict:
+    """Add weekly series together, e.g. a user's repositories into the user's total."""
+    series = [item for item in series if item and item['added']]
+    if not series:
+        return empty_series()
+    start = min(item['start_week'] for item in series)
+    end = max(item['start_week'] + len(item['added']) for item in series)
+    added = np.zeros(end - start, dtype=np.int64)
+    deleted = np.zeros(end - start, dtype=np.int64)
+    for item in series:
+        offset = item['start_week'] - start
+        added[offset:offset + len(item['added'])] += np.asarray(item['added'], dtype=np.int64)
+        deleted[offset:offset + len(item['deleted'])] += np.asarray(item['deleted'], dtype=np.int64)
+    return {'start_week': start, 'added': added.tolist(), 'deleted': deleted.tolist()}
+
+
+def encode_series(series: Dict) -> Dict:
+    """Stored form of a series: the counts as little-endian int64 bytes rather than BSON arrays."""
+    return {
+        'start_week': series['start_week'],
+        'added': np.asarray(series['added'], dtype='<i8').tobytes(),
+        'deleted': np.asarray(series['deleted'], dtype='<i8').tobytes()
+    }
+
+
+def decode_series(stored: Dict) -> Dict:
+    return {
+        'start_week': stored['start_week'],
+        'added': np.frombuffer(stored['added'], dtype='<i8').tolist(),
+        'deleted': np.frombuffer(stored['deleted'], dtype='<i8').tolist()
+    }
+
+
+def period_range(period: str, now: Optional[datetime] = None) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """``[start, end)`` of a named period: ``all_time``, ``year_YYYY``, ``last_90_days``, ``rolling_12_months``."""
+    now = now or datetime.now(timezone.utc)
+    if period == 'all_time':
+        return None, None
+    match = YEAR_PERIOD.match(period)
+    if match:
+        year = int(match.group(1))
+        return datetime(year, 1, 1, tzinfo=timezone.utc), datetime(year + 1, 1, 1, tzinfo=timezone.utc)
+    if period in ROLLING_PERIODS:
+        return now - ROLLING_PERIODS[period], None
+    raise ValueError(f"Unknown period: {period}")
+
+
+class SeriesMatrix:
+    """Many users' weekly series flattened into one array for vectorized window sums.
+
+    All series are concatenated with their running totals, so the total of
+    any week window for every user is one fancy-indexed subtraction, with no
+    per-user Python work.
+    """
+
+    def __init__(self, usernames: List[str], series: List[Dict]):
+        self.usernames = np.array(usernames, dtype=object)
+        self.start_weeks = np.array([item['start_week'] for item in series], dtype=np.int64)
+        self.lengths = np.array([len(item['added']) for item in series], dtype=np.int64)
+        # Where each user's slice starts in the running totals (after its 0 placeholder)
+        self.offsets = np.cumsum(self.lengths + 1) - (self.lengths + 1)
+        self._added = _running_totals(series, 'added')
+        self._deleted = _running_totals(series, 'deleted')
+
+    @classmethod
+    def from_docs(cls, docs: Iterable[Dict]) -> 'SeriesMatrix':
+        """Build from user documents holding an encoded ``series``."""
+        usernames = []
+        series = []
+        for doc in docs:
+            usernames.append(doc['username'])
+            series.append({
+                'start_week': doc['series']['start_week'],
+                'added': np.frombuffer(doc['series']['added'], dtype='<i8'),
+                'deleted': np.frombuffer(doc['series']['deleted'], dtype='<i8')
+            })
+        return cls(usernames, series)
+
+    def __len__(self) -> int:
+        return len(self.usernames)
+
+    def window(self, start: Optional[datetime], end: Optional[datetime]) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-user added and deleted totals over the weeks from ``start`` up to ``end``.
+
+        Windows are whole weeks: a week counts if it starts on or after the
+        Monday of ``start``'s week and before ``end``.
+        """
+        first = week_of(start.timestamp()) if start else np.iinfo(np.int64).min // 2
+        last = week_of(end.timestamp() - 1) + 1 if end else np.iinfo(np.int64).max // 2
+        low = np.clip(first - self.start_weeks, 0, self.lengths)
+        high = np.clip(last - self.start_weeks, 0, self.lengths)
+        return (
+            self._added[self.offsets + high] - self._added[self.offsets + low],
+            self._deleted[self.offsets + high] - self._deleted[self.offsets + low]
+        )
+
+    def top(self, start: Optional[datetime], end: Optional[datetime], limit: int = 10) -> List[Dict]:
+        """The ``limit`` users with the most net lines in the window, best first."""
+        added, deleted = self.window(start, end)
+        net = added - deleted
+        active = np.flatnonzero((added != 0) | (deleted != 0))
+        # Sort by net descending, then username, like the stored leaderboards
+        order = active[np.lexsort((self.usernames[active].astype(str), -net[active]))][:limit]
+        return [
+            {
+                'username': self.usernames[i],
+                'total_added': int(added[i]),
+                'total_deleted': int(deleted[i]),
+                'total_net': int(net[i])
+            }
+            for i in order
+        ]
+
+
+def _running_totals(series: List[Dict], key: str) -> np.ndarray:
+    """Running total over every series laid end to end, each behind a 0 placeholder.
+
+    A window sum is then ``totals[offset + high] - totals[offset + low]``;
+    both ends fall within the same user's slice, so no per-user reset is needed.
+    """
+    parts = [np.zeros(1, dtype=np.int64)]
+    for item in series:
+        parts.append(np.asarray(item[key], dtype=np.int64))
+        parts.append(np.zeros(1, dtype=np.int64))
+    return np.cumsum(np.concatenate(parts))
@@ -0,0 +1,185 @@
+import threading
+from typing import Dict, Mapping, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+import telemetry
+from http_cache import ResponseCache
+from rate_limit import RateLimiter, token_pool_from_env
+
+GITHUB_API_URL = "https://api.github.com"
+# Token for a client that must make unauthenticated calls; None means the default token
+ANONYMOUS = ''
+
+# Connections kept alive per host; sized for the analysis worker pool plus UI calls
+POOL_MAXSIZE = 32
+
+_session: Optional[requests.Session] = None
+_response_cache: Optional[ResponseCache] = None
+_rate_limiter: Optional[RateLimiter] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide ``requests.Session`` used for GitHub API calls.
+
+    Sharing one session keeps TCP/TLS connections alive between calls instead
+    of paying a new handshake for every request.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide conditional-request cache (see ``ResponseCache``)."""
+    global _response_cache
+    if _response_cache is None:
+        with _session_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache()
+    return _response_cache
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide ``RateLimiter``, pooling tokens from ``GITHUB_TOKEN_POOL``."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _session_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter(token_pool=token_pool_from_env())
+    return _rate_limiter
+
+
+def cached_get(url: str,
+               headers: Optional[Dict] = None,
+               params: Optional[Dict] = None,
+               session: Optional[requests.Session] = None,
+               cache: Optional[ResponseCache] = None,
+               limiter: Optional[RateLimiter] = None,
+               public: bool = False) -> requests.Response:
+    """GET ``url`` as a conditional request, answering 304s from ``cache``.
+
+    Behaves like ``session.get``; a revalidated response comes back as a
+    regular 200 whose body and headers are the stored ones. With a
+    ``limiter`` the call is scheduled against the token's rate limit budget
+    and retried when throttled. ``public`` marks calls any token may make,
+    so the limiter can route them through its token pool.
+    """
+    session = session or get_session()
+    headers = dict(headers or {})
+    authorization = headers.get('Authorization', '')
+
+    def get(request_headers: Dict) -> requests.Response:
+        telemetry.count('api_calls')
+        return session.get(url, headers=request_headers, params=params)
+
+    def send(extra_headers: Dict) -> requests.Response:
+        # The span includes time spent waiting on the rate limiter and retries
+        with telemetry.span('api', endpoint=urlparse(url).path):
+            if limiter is None:
+                return get({**headers, **extra_headers})
+
+            def attempt(pooled_token: Optional[str]) -> requests.Response:
+                override = {'Authorization': f'token {pooled_token}'} if pooled_token else {}
+                return get({**headers, **extra_headers, **override})
+
+            token = authorization.split()[-1] if authorization.strip() else None
+            return limiter.request(attempt, token=token, public=public)
+
+    if cache is None:
+        return send({})
+
+    # Public responses are the same for every token, so they share one cache scope
+    exchange = revalidate(cache, cache.key_for(url, params, '' if public else authorization))
+    extra_headers = next(exchange)
+    try:
+        while True:
+            extra_headers = exchange.send(send(extra_headers))
+    except StopIteration as done:
+        response, entry = done.value
+    return _replay(response, entry) if entry is not None else response
+
+
+def revalidate(cache: ResponseCache, key: str):
+    """Conditional GET logic for ``cache``, shared by the sync and async clients.
+
+    A generator that does no network I/O itself: it yields the extra headers
+    for each request to make and is sent back the response. It returns
+    ``(response, None)`` when ``response`` should be used as is, or
+    ``(not_modified, entry)`` when a 304 is to be answered with the stored
+    ``entry['headers']`` and ``entry['body']``.
+    """
+    response = yield cache.validators(key)
+
+    if response.status_code == 304:
+        telemetry.count('api_not_modified')
+        entry = cache.lookup(key)
+        if entry is not None:
+            return response, {'headers': _replay_headers(response.headers, entry['headers']), 'body': entry['body']}
+        # The entry expired between the two calls; ask again unconditionally
+        response = yield {}
+
+    if response.status_code == 200:
+        cache.store(key, response.headers, response.content)
+    return response, None
+
+
+def _replay_headers(live: Mapping[str, str], stored: Mapping[str, str]) -> CaseInsensitiveDict:
+    headers = CaseInsensitiveDict(stored)
+    # Rate limit headers describe the current state, so take them from the live 304
+    for name, value in live.items():
+        if name.lower().startswith('x-ratelimit-'):
+            headers[name] = value
+    # The stored body is already decoded
+    headers.pop('Content-Encoding', None)
+    headers.pop('Content-Length', None)
+    return headers
+
+
+def _replay(not_modified: requests.Response, entry: Dict) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = 'OK'
+    response._content = entry['body']
+    response.headers = entry['headers']
+    response.url = not_modified.url
+    response.request = not_modified.request
+    response.encoding = 'utf-8'
+    return response
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def http2_available() -> bool:
+    """Whether the optional ``h2`` package is installed so httpx can speak HTTP/2."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def last_page_number(response) -> int:
+    """Read the page count from a paginated GitHub response's ``Link`` header.
+
+    Works for both ``requests`` and ``httpx`` responses. Returns 1 when the
+    response has no ``rel="last"`` link, i.e. everything fit on one page.
+    """
+    last = response.links.get('last', {}).get('url')
+    if not last:
+        return 1
+    query = parse_qs(urlparse(str(last)).query)
+    return int(query.get('page', ['1'])[0])
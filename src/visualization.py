@@ -2,7 +2,12 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import streamlit as st
-import os
+import hashlib
+
+# Repositories drawn as their own bar; the rest are summed into an "Other" bar
+TOP_REPOSITORIES = 30
+# Figures kept in memory across reruns and sessions
+FIGURE_CACHE_ENTRIES = 64
 
 def create_metrics_display(df: pd.DataFrame):
     total_added = df['added_lines'].sum()
@@ -14,10 +19,25 @@ def create_metrics_display(df: pd.DataFrame):
     col2.metric("Total Deleted Lines", f"{total_deleted:,}")
     col3.metric("Net Lines", f"{total_net:,}")
 
-def create_contribution_charts(df: pd.DataFrame):
-    # Bar Chart
-    fig_bar = px.bar(
-        df,
+def top_repositories(df: pd.DataFrame, top_n: int = TOP_REPOSITORIES) -> pd.DataFrame:
+    """The ``top_n`` repositories with the most lines changed, the rest summed into one "Other" row."""
+    changed = df['added_lines'] + df['deleted_lines']
+    ranked = df.assign(_changed=changed).sort_values('_changed', ascending=False, kind='stable').drop(columns='_changed')
+    if len(ranked) <= top_n:
+        return ranked
+    top, rest = ranked.iloc[:top_n], ranked.iloc[top_n:]
+    other = pd.DataFrame([{
+        'repository': f"Other ({len(rest):,} repositories)",
+        'added_lines': rest['added_lines'].sum(),
+        'deleted_lines': rest['deleted_lines'].sum(),
+        'total_lines': rest['total_lines'].sum()
+    }])
+    return pd.concat([top[other.columns], other], ignore_index=True)
+
+def create_contribution_bar(df: pd.DataFrame, top_n: int = TOP_REPOSITORIES) -> go.Figure:
+    """Added and deleted lines per repository, for the ``top_n`` busiest ones plus "Other"."""
+    return px.bar(
+        top_repositories(df, top_n),
         x='repository',
         y=['added_lines', 'deleted_lines'],
         title='Contributions by Repository',
@@ -28,55 +48,18 @@ def create_contribution_charts(df: pd.DataFrame):
             'deleted_lines': '#dc3545'
         }
     )
-    
-    # Line Chart
-    fig_line = go.Figure()
-    fig_line.add_trace(go.Scatter(
-        x=df['repository'],
-        y=df['added_lines'],
-        mode='lines+markers',
-        name='Added Lines',
-        line=dict(color='#28a745')
-    ))
-    fig_line.add_trace(go.Scatter(
-        x=df['repository'],
-        y=df['deleted_lines'],
-        mode='lines+markers',
-        name='Deleted Lines',
-        line=dict(color='#dc3545')
-    ))
-    fig_line.update_layout(
-        title='Line Contributions Over Repositories',
-        xaxis_title='Repositories',
-        yaxis_title='Lines of Code',
-        height=500
-    )
-    
-    return fig_bar, fig_line 
 
-def create_social_share_image(username: str, added: int, deleted: int, net: int, verification_hash: str) -> str:
-    """
-    Creates a social media preview image with user stats.
-    Returns the path to the generated image.
-    """
-    # Create figure
-    plt.figure(figsize=(12, 6))
-    plt.style.use('dark_background')
-    
-    # Add text
-    plt.text(0.5, 0.8, f"GitHub Contributions by @{username}", ha='center', va='center', fontsize=24)
-    plt.text(0.5, 0.6, f"Added: {added:,} lines", ha='center', va='center', fontsize=20, color='#00ff00')
-    plt.text(0.5, 0.4, f"Deleted: {deleted:,} lines", ha='center', va='center', fontsize=20, color='#ff0000')
-    plt.text(0.5, 0.2, f"Net Change: {net:,} lines", ha='center', va='center', fontsize=20, color='#ffffff')
-    plt.text(0.5, 0.1, f"Verification: #{verification_hash}", ha='center', va='center', fontsize=16, color='#888888')
-    
-    # Remove axes
-    plt.axis('off')
-    
-    # Save to temporary file
-    os.makedirs('temp', exist_ok=True)
-    image_path = f'temp/share_{username}.png'
-    plt.savefig(image_path, bbox_inches='tight', facecolor='#0D1117')
-    plt.close()
-    
-    return image_path
\ No newline at end of file
+def frame_key(df: pd.DataFrame) -> str:
+    """Content hash of a DataFrame (values, index and column names)."""
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    digest.update('\x1f'.join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+def cached_contribution_bar(df: pd.DataFrame, top_n: int = TOP_REPOSITORIES) -> go.Figure:
+    """``create_contribution_bar``, built once per distinct DataFrame and shared across reruns."""
+    return _cached_bar(frame_key(df), df, top_n)
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def _cached_bar(key: str, _df: pd.DataFrame, top_n: int) -> go.Figure:
+    # ``_df`` is left out of Streamlit's hashing; ``key`` already identifies it
+    return create_contribution_bar(_df, top_n)
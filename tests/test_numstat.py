@@ -0,0 +1,91 @@
+import io
+import subprocess
+
+import pytest
+
+from numstat import LOG_FORMAT, FileStats, parse_chunk, parse_log
+
+
+def _log(*commits):
+    lines = []
+    for timestamp, sha, stats in commits:
+        lines.append(f'-1\t{timestamp}\t{sha}\x1fAda\x1fada@example.com')
+        lines.extend(stats)
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def _paths(chunk):
+    _, changes = parse_chunk(chunk, details=True)
+    return changes['path'].tolist()
+
+
+def test_rename_forms_resolve_to_new_path():
+    chunk = _log((1700000000, 'a' * 40, [
+        '3\t1\tsrc/{old => new}/a.py',
+        '2\t0\t{lib => src}/b.py',
+        '1\t1\tsrc/{ => nested}/c.py',
+        '4\t2\tdocs/{guide.md => }',
+        '5\t0\told.txt => new.txt',
+        '1\t0\tplain.py'
+    ]))
+    assert _paths(chunk) == ['src/new/a.py', 'src/b.py', 'src/nested/c.py', 'docs/', 'new.txt', 'plain.py']
+    commits, _ = parse_chunk(chunk, details=True)
+    assert commits['renamed_files'].tolist() == [5]
+
+
+def test_binary_files_and_dash_paths():
+    chunk = _log((1700000000, 'd' * 40, ['-\t-\tlogo.png', '2\t1\t-', '1\t0\tdocs/-']))
+    commits, changes = parse_chunk(chunk, details=True)
+    assert commits['binary_files'].tolist() == [1]
+    assert changes['path'].tolist() == ['-', 'docs/-']
+    assert changes['added'].tolist() == [2, 1]
+
+
+def test_quoted_paths_are_unquoted():
+    chunk = _log((1700000000, 'b' * 40, [
+        '2\t0\t"src/\\303\\251.py"',
+        '1\t0\t"src/t\\"q.py"',
+        '1\t1\t"src/\\303\\251.py" => "src/\\303\\274.py"',
+        '1\t0\tsrc/old.py => "lib/n\\"ew.py"',
+        '3\t0\tsrc/{é.py => ü.py}'
+    ]))
+    assert _paths(chunk) == ['src/é.py', 'src/t"q.py', 'src/ü.py', 'lib/n"ew.py', 'src/ü.py']
+
+
+def test_breakdown_groups_non_ascii_paths():
+    files = FileStats()
+    chunk = _log((1700000000, 'c' * 40, ['2\t0\t"src/\\303\\251.py"', '2\t1\tdocs/{a.md => ü.md}']))
+    list(parse_log(io.BytesIO(chunk), files=files))
+    breakdown = files.breakdown()
+    assert set(breakdown['extensions']) == {'.py', '.md'}
+    assert set(breakdown['directories']) == {'src', 'docs'}
+    assert [f['path'] for f in breakdown['top_files']] == ['docs/ü.md', 'src/é.py']
+
+
+def test_git_log_paths(tmp_path):
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=tmp_path, check=True, capture_output=True).stdout
+
+    try:
+        git('init', '-q')
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("git is not available")
+    git('config', 'user.name', 'Ada')
+    git('config', 'user.email', 'ada@example.com')
+    (tmp_path / 'src').mkdir()
+    (tmp_path / 'src' / 'é.py').write_text('a\nb\n')
+    (tmp_path / 'src' / 'old.py').write_text('1\n2\n3\n4\n5\n')
+    git('add', '-A')
+    git('commit', '-q', '-m', 'add')
+    git('mv', 'src/old.py', 'src/new.py')
+    (tmp_path / 'src' / 'é.py').write_text('a\nb\nc\n')
+    git('commit', '-q', '-a', '-m', 'rename')
+
+    files = FileStats()
+    # As _walk_contributions runs it
+    log = git('-c', 'core.quotePath=false', 'log', '--all', f'--pretty=tformat:{LOG_FORMAT}', '--numstat')
+    list(parse_log(io.BytesIO(log), files=files))
+    totals = files.totals()
+    assert totals.loc['src/é.py'].tolist() == [3, 0]
+    assert totals.loc['src/new.py'].tolist() == [0, 0]
+    assert 'src/old.py' in totals.index